@@ -0,0 +1,271 @@
+"""
+Admission control and load shedding for test-flow endpoints.
+
+- Each controlled route has a priority, its own concurrency cap and a
+  bounded wait queue; all routes share one global concurrency limit.
+- When capacity frees up, the highest-priority waiter whose route still has
+  room is admitted first, so submit_answer (protecting work already done)
+  beats next_question, which beats new test starts and logins.
+- Requests are rejected early with 503 + Retry-After when their queue is
+  full or they wait longer than ADMISSION_MAX_WAIT_SECONDS.
+- Runs as pure ASGI middleware on the event loop, so the bookkeeping needs
+  no locks; queue depth and rejection counters are exposed via stats().
+- Long-lived channels (WebSocket, SSE) are not held by the middleware;
+  their handlers acquire/release around each unit of work instead, using
+  rules with middleware=False or the matching HTTP route's rule.
+"""
+
+import asyncio
+import bisect
+import itertools
+import re
+import time
+from typing import Dict, List, Optional
+
+from starlette.responses import JSONResponse
+
+from .config import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_RETRY_AFTER_SECONDS,
+)
+
+
+class RouteRule:
+    """Admission settings for one route (method + path regex)."""
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        pattern: str,
+        priority: int,
+        max_concurrency: int,
+        max_queue: int,
+        middleware: bool = True,
+    ):
+        self.name = name
+        self.method = method
+        self.regex = re.compile(pattern)
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        # False: only acquired explicitly by the handler, never by the middleware
+        self.middleware = middleware
+
+
+# Higher priority wins when capacity frees up
+DEFAULT_RULES = [
+    RouteRule("submit_answer", "POST", r"^/api/submit_answer$", priority=3, max_concurrency=32, max_queue=512),
+    # Offline batch uploads: same priority, but only a few at a time
+    RouteRule("submit_answers", "POST", r"^/api/submit_answers$", priority=3, max_concurrency=4, max_queue=32),
+    RouteRule("stream_answer", "POST", r"^/api/stream/\d+/answer$", priority=3, max_concurrency=32, max_queue=512),
+    RouteRule("next_question", "GET", r"^/api/next_question/\d+$", priority=2, max_concurrency=24, max_queue=256),
+    # The SSE stream stays open for the whole test; the handler only holds a
+    # slot while it selects the first question
+    RouteRule(
+        "stream_events",
+        "GET",
+        r"^/api/stream/\d+/events$",
+        priority=2,
+        max_concurrency=24,
+        max_queue=256,
+        middleware=False,
+    ),
+    RouteRule("test_start", "GET", r"^/test/start$", priority=1, max_concurrency=8, max_queue=128),
+    # Password hashing is CPU heavy, keep logins on a short leash
+    RouteRule("login", "POST", r"^/auth/login$", priority=0, max_concurrency=8, max_queue=64),
+]
+
+
+class _Waiter:
+    __slots__ = ("key", "rule", "future", "admitted")
+
+    def __init__(self, key: tuple, rule: RouteRule, future: asyncio.Future):
+        self.key = key
+        self.rule = rule
+        self.future = future
+        self.admitted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.key < other.key
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rules: List[RouteRule],
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        retry_after: int = ADMISSION_RETRY_AFTER_SECONDS,
+    ):
+        self.rules = rules
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._seq = itertools.count()
+        # Waiters sorted by (-priority, arrival order)
+        self._waiters: List[_Waiter] = []
+        self._active_total = 0
+        self._active: Dict[str, int] = {r.name: 0 for r in rules}
+        self._queued: Dict[str, int] = {r.name: 0 for r in rules}
+        self._counters: Dict[str, Dict[str, float]] = {
+            r.name: {
+                "admitted": 0,
+                "rejected_queue_full": 0,
+                "rejected_timeout": 0,
+                "peak_queued": 0,
+                "waited": 0,
+                "total_wait_seconds": 0.0,
+            }
+            for r in rules
+        }
+
+    def match(self, method: str, path: str) -> Optional[RouteRule]:
+        for rule in self.rules:
+            if rule.middleware and rule.method == method and rule.regex.match(path):
+                return rule
+        return None
+
+    def rule(self, name: str) -> RouteRule:
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        raise KeyError(name)
+
+    def _has_capacity(self, rule: RouteRule) -> bool:
+        return (
+            self._active_total < self.max_concurrency
+            and self._active[rule.name] < rule.max_concurrency
+        )
+
+    def _admit(self, rule: RouteRule):
+        self._active_total += 1
+        self._active[rule.name] += 1
+        self._counters[rule.name]["admitted"] += 1
+
+    def _dispatch(self):
+        """Hand freed capacity to the best waiters that fit."""
+        i = 0
+        while i < len(self._waiters) and self._active_total < self.max_concurrency:
+            waiter = self._waiters[i]
+            if self._active[waiter.rule.name] < waiter.rule.max_concurrency:
+                self._waiters.pop(i)
+                self._queued[waiter.rule.name] -= 1
+                self._admit(waiter.rule)
+                waiter.admitted = True
+                if not waiter.future.done():
+                    waiter.future.set_result(True)
+            else:
+                i += 1
+
+    async def acquire(self, rule: RouteRule) -> Optional[str]:
+        """
+        Wait for a slot. Returns None once admitted (caller must release),
+        or the rejection reason.
+        """
+        if self._has_capacity(rule):
+            self._admit(rule)
+            return None
+
+        counters = self._counters[rule.name]
+        if self._queued[rule.name] >= rule.max_queue:
+            counters["rejected_queue_full"] += 1
+            return "queue_full"
+
+        waiter = _Waiter((-rule.priority, next(self._seq)), rule, asyncio.get_running_loop().create_future())
+        bisect.insort(self._waiters, waiter)
+        self._queued[rule.name] += 1
+        counters["waited"] += 1
+        counters["peak_queued"] = max(counters["peak_queued"], self._queued[rule.name])
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.max_wait)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.admitted:
+                return None
+            self._drop(waiter)
+            counters["rejected_timeout"] += 1
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away while queued (or right after admission)
+            if waiter.admitted:
+                self.release(rule)
+            else:
+                self._drop(waiter)
+            raise
+        finally:
+            counters["total_wait_seconds"] += time.perf_counter() - started
+
+    def _drop(self, waiter: _Waiter):
+        index = bisect.bisect_left(self._waiters, waiter)
+        if index < len(self._waiters) and self._waiters[index] is waiter:
+            self._waiters.pop(index)
+            self._queued[waiter.rule.name] -= 1
+
+    def release(self, rule: RouteRule):
+        self._active_total -= 1
+        self._active[rule.name] -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict:
+        routes = {}
+        for rule in self.rules:
+            counters = self._counters[rule.name]
+            waited = counters["waited"]
+            routes[rule.name] = {
+                "priority": rule.priority,
+                "max_concurrency": rule.max_concurrency,
+                "max_queue": rule.max_queue,
+                "active": self._active[rule.name],
+                "queued": self._queued[rule.name],
+                "peak_queued": counters["peak_queued"],
+                "admitted": counters["admitted"],
+                "rejected_queue_full": counters["rejected_queue_full"],
+                "rejected_timeout": counters["rejected_timeout"],
+                # Mean time spent queued, over requests that had to wait
+                "mean_wait_ms": (counters["total_wait_seconds"] / waited * 1000.0) if waited else 0.0,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_wait_seconds": self.max_wait,
+            "active": self._active_total,
+            "queued": len(self._waiters),
+            "routes": routes,
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to matching requests."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.controller.match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejected = await self.controller.acquire(rule)
+        if rejected:
+            response = JSONResponse(
+                {"detail": "Server busy, please retry shortly", "reason": rejected},
+                status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(rule)
+
+
+# Shared controller used by the app and the admin stats endpoint
+admission = AdmissionController(DEFAULT_RULES)
@@ -4,10 +4,82 @@ Application configuration values.
 Kept simple so settings are easy to explain at viva.
 """
 
+import logging
+import os
+import secrets
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
 MODEL_PATH = BASE_DIR / "test_engine" / "logreg.joblib"
 
+# User-sharded storage: attempts/attempt_rollups are spread over this many
+# SQLite files (by user id) under SHARD_DIR; 1 keeps everything in
+# main_website.db. Change it only together with `python -m app.sharding rebalance`.
+SHARD_COUNT = int(os.environ.get("INTELLIPREP_SHARDS", "1"))
+SHARD_DIR = BASE_DIR.parent / "shards"
+
+# Slow-request captures (cProfile dumps + SQL lists) are written here
+PROFILE_DIR = BASE_DIR.parent / "profiles"
+
+# Closed months of raw attempts are moved here as one SQLite file per month
+ARCHIVE_DIR = BASE_DIR.parent / "archive"
+
 # Security / auth simple constants
-PWD_HASH_SCHEME = "argon2"
\ No newline at end of file
+PWD_HASH_SCHEME = "argon2"
+
+# Signed session tokens (HMAC-SHA256). Set INTELLIPREP_SECRET_KEY in
+# deployment; without it a random key is generated per process, so tokens
+# do not survive restarts and are not shared between workers.
+SECRET_KEY = os.environ.get("INTELLIPREP_SECRET_KEY")
+if not SECRET_KEY:
+    SECRET_KEY = secrets.token_urlsafe(32)
+    logging.getLogger(__name__).warning(
+        "INTELLIPREP_SECRET_KEY is not set; using a random per-process token key"
+    )
+TOKEN_TTL_SECONDS = 8 * 60 * 60
+SESSION_COOKIE_NAME = "intelliprep_token"
+
+# Usernames allowed to use admin endpoints (comma-separated env var)
+ADMIN_USERNAMES = {
+    name.strip() for name in os.environ.get("INTELLIPREP_ADMINS", "").split(",") if name.strip()
+}
+
+# Number of users whose skill stats are kept in the in-process LRU cache
+STATS_CACHE_SIZE = 4096
+
+# Most answers accepted by one POST /api/submit_answers batch
+SUBMIT_ANSWERS_MAX_BATCH = 20_000
+
+# Scheduled cohort exams (see app/services/exam_service.py).
+# Warm-up (catalog, model, stats, first question, sessions) starts this
+# long before the exam's start time.
+EXAM_PREWARM_LEAD_SECONDS = 120
+# Pre-allocated sessions not claimed this long after start are released
+EXAM_CLAIM_WINDOW_SECONDS = 30 * 60
+
+# Admission control for test-flow endpoints (see app/admission.py).
+# Total requests admitted at once across controlled routes; keep it below
+# the threadpool size (40 by default) so admitted work never queues twice.
+ADMISSION_MAX_CONCURRENCY = 32
+# Longest a request may wait in the admission queue before a 503
+ADMISSION_MAX_WAIT_SECONDS = 5.0
+ADMISSION_RETRY_AFTER_SECONDS = 2
+
+# Slow-request capture (see app/profiling.py). Handler calls slower than the
+# threshold keep their SQL list; this fraction of calls also runs under
+# cProfile so slow ones come with a .prof dump. Threshold 0 disables capture.
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("INTELLIPREP_SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_PROFILE_RATE = 0.05
+# Newest captures kept on disk
+SLOW_REQUEST_KEEP = 50
+# Upper bound for one on-demand sampling profile
+PROFILER_MAX_SECONDS = 60
+
+# Cross-request micro-batching of model inference (see
+# app/test_engine/inference_batcher.py): a batch closes this long after its
+# first request was queued, or once it holds this many feature rows.
+INFERENCE_BATCHING = os.environ.get("INTELLIPREP_INFERENCE_BATCHING", "1") == "1"
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.environ.get("INTELLIPREP_INFERENCE_MAX_WAIT_MS", "2"))
+INFERENCE_BATCH_MAX_ROWS = int(os.environ.get("INTELLIPREP_INFERENCE_MAX_ROWS", "65536"))
+# A caller waiting longer than this for its batch predicts on its own thread
+INFERENCE_BATCH_TIMEOUT_SECONDS = 5.0
@@ -2,13 +2,21 @@
 Database models and setup for IntelliPrep.
 
 - Uses SQLAlchemy with SQLite.
-- Models: User, Question, Attempt
+- Models: User, Question, Attempt, AttemptRollup
 - Includes a small static question bank initializer.
+- Optional user sharding: attempts/attempt_rollups can live in SHARD_COUNT
+  SQLite files picked by hashing the user id (ShardSessionLocal); users and
+  questions stay in main_website.db, which every shard ATTACHes as "shared"
+  so joins to questions work unchanged.
 """
 
 from datetime import datetime
 import json
-from typing import List
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List
 
 from sqlalchemy import (
     Column,
@@ -19,9 +27,14 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     create_engine,
+    event,
     Text,
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.orm import Session, declarative_base, deferred, relationship, sessionmaker
+
+from .config import ARCHIVE_DIR, SHARD_COUNT, SHARD_DIR
 
 # SQLite file stored at project root
 DATABASE_URL = "sqlite:///./main_website.db"
@@ -32,6 +45,20 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def configure_engine(database_url: str):
+    """
+    Point the module-level engine and SessionLocal at another database.
+    Used by offline tools (e.g. the simulator) to run against a temp SQLite file.
+    Sharding is reset to a single shard (the new engine); call
+    configure_shards() afterwards to shard against it.
+    """
+    global engine
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    SessionLocal.configure(bind=engine)
+    configure_shards(1)
+    return engine
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -44,9 +71,11 @@ class User(Base):
 class Question(Base):
     __tablename__ = "questions"
     id = Column(Integer, primary_key=True, index=True)
-    text = Column(Text, nullable=False)
+    # text/options are deferred ("content" group): hot paths only need
+    # id/domain/difficulty, see app/read_models.py
+    text = deferred(Column(Text, nullable=False), group="content")
     # store options as JSON string for simplicity
-    options = Column(Text, nullable=False)
+    options = deferred(Column(Text, nullable=False), group="content")
     correct_option = Column(Integer, nullable=False)  # index of correct option
     difficulty = Column(String(32), nullable=False)  # 'easy'|'medium'|'hard'
     domain = Column(String(64), nullable=False)  # e.g., 'algebra', 'calculus'
@@ -59,8 +88,10 @@ class Question(Base):
 
 class Attempt(Base):
     __tablename__ = "attempts"
+    # Never reuse ids once closed months are moved out to archive files
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     correct = Column(Boolean, nullable=False)
     time_taken = Column(Float, nullable=False)
@@ -70,6 +101,199 @@ class Attempt(Base):
     question = relationship("Question", back_populates="attempts")
 
 
+class AttemptRollup(Base):
+    """
+    Per-user/domain/difficulty totals for a closed month.
+    Written by PartitionService.compact() when raw attempts are archived.
+    """
+
+    __tablename__ = "attempt_rollups"
+    period = Column(String(7), primary_key=True)  # 'YYYY-MM'
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, index=True)
+    domain = Column(String(64), primary_key=True)
+    difficulty = Column(String(32), primary_key=True)
+    attempts = Column(Integer, nullable=False)
+    correct = Column(Integer, nullable=False)
+    total_time = Column(Float, nullable=False)
+
+
+# Tables that follow the user into their shard
+SHARDED_TABLES = [Attempt.__table__, AttemptRollup.__table__]
+# Shard i's attempt ids start at (i + 1) << SHARD_ID_BITS so ids stay unique
+# across shards and never collide with ids handed out by the main database
+# before sharding (those also end up in the shared monthly archive files)
+SHARD_ID_BITS = 40
+
+_shard_count = 1
+_shard_dir = Path(SHARD_DIR)
+_shard_sessions: Dict[int, sessionmaker] = {}
+_shard_lock = threading.Lock()
+
+
+def shard_index(user_id: int, count: int = None) -> int:
+    """Stable shard number for a user (crc32 of the id)."""
+    count = _shard_count if count is None else count
+    if count <= 1:
+        return 0
+    return zlib.crc32(struct.pack(">q", user_id)) % count
+
+
+def shard_path(index: int, shard_dir: Path = None) -> Path:
+    return Path(shard_dir or _shard_dir) / f"attempts_{index}.db"
+
+
+def create_shard_engine(index: int, shard_dir: Path = None) -> Engine:
+    """
+    Engine for one shard file, with the main database attached as "shared"
+    and the sharded tables created on first use.
+    """
+    path = shard_path(index, shard_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    shard_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    shared_path = engine.url.database
+    index_offset = (index + 1) << SHARD_ID_BITS
+
+    @event.listens_for(shard_engine, "connect")
+    def _attach_shared(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ? AS shared", (shared_path,))
+
+    # One IMMEDIATE transaction so concurrent workers opening a new shard
+    # file do not race on the DDL or the id range
+    raw = shard_engine.raw_connection()
+    try:
+        raw.execute("BEGIN IMMEDIATE")
+        for table in SHARDED_TABLES:
+            # IF NOT EXISTS only looks at the shard itself, not "shared"
+            raw.execute(str(CreateTable(table, if_not_exists=True).compile(dialect=shard_engine.dialect)))
+            for table_index in table.indexes:
+                raw.execute(str(CreateIndex(table_index, if_not_exists=True).compile(dialect=shard_engine.dialect)))
+        raw.execute(
+            "INSERT INTO main.sqlite_sequence (name, seq) SELECT 'attempts', ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = 'attempts')",
+            (index_offset,),
+        )
+        # Shard files created with a lower range are moved up to theirs
+        raw.execute(
+            "UPDATE main.sqlite_sequence SET seq = ? WHERE name = 'attempts' AND seq < ?",
+            (index_offset, index_offset),
+        )
+        raw.commit()
+    finally:
+        raw.close()
+    return shard_engine
+
+
+def configure_shards(count: int, shard_dir: Path = None):
+    """
+    Set the number of user shards (1 = everything in the main database).
+    Shard engines are created lazily.
+    """
+    global _shard_count, _shard_dir
+    with _shard_lock:
+        for factory in _shard_sessions.values():
+            factory.kw["bind"].dispose()
+        _shard_sessions.clear()
+        _shard_count = max(int(count), 1)
+        _shard_dir = Path(shard_dir or SHARD_DIR)
+
+
+def shard_count() -> int:
+    return _shard_count
+
+
+def _shard_factory(index: int) -> sessionmaker:
+    factory = _shard_sessions.get(index)
+    if factory is None:
+        with _shard_lock:
+            factory = _shard_sessions.get(index)
+            if factory is None:
+                factory = sessionmaker(
+                    autocommit=False, autoflush=False, bind=create_shard_engine(index, _shard_dir)
+                )
+                _shard_sessions[index] = factory
+    return factory
+
+
+def ShardSessionLocal(user_id: int) -> Session:
+    """
+    SessionLocal for a user's attempts/rollups: their shard, or the main
+    database when sharding is off.
+    """
+    if _shard_count <= 1:
+        return SessionLocal()
+    return _shard_factory(shard_index(user_id))()
+
+
+def shard_engines() -> List[Engine]:
+    """Every engine holding sharded tables, in shard order."""
+    if _shard_count <= 1:
+        return [engine]
+    return [_shard_factory(i).kw["bind"] for i in range(_shard_count)]
+
+
+def shard_sessions() -> List[Session]:
+    """One new session per shard, in shard order (caller closes them)."""
+    if _shard_count <= 1:
+        return [SessionLocal()]
+    return [_shard_factory(i)() for i in range(_shard_count)]
+
+
+configure_shards(SHARD_COUNT)
+
+
+def upgrade_attempts_table(bind: Engine = None, archive_dir: Path = ARCHIVE_DIR) -> bool:
+    """
+    Rebuild an attempts table created before it used AUTOINCREMENT (SQLite
+    would otherwise hand out ids again once the newest rows are archived).
+    The id sequence is seeded above every id already in the monthly archive
+    files. Returns True if the table was rebuilt.
+    """
+    bind = bind or engine
+    table_sql = "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attempts'"
+    raw = bind.raw_connection()
+    try:
+        row = raw.execute(table_sql).fetchone()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            return False
+
+        archived_max = 0
+        for path in sorted(Path(archive_dir).glob("attempts_*.db")):
+            # ATTACH must run outside a transaction
+            raw.execute("ATTACH DATABASE ? AS archived", (str(path),))
+            try:
+                (max_id,) = raw.execute("SELECT max(id) FROM archived.attempts").fetchone()
+                archived_max = max(archived_max, max_id or 0)
+            finally:
+                raw.execute("DETACH DATABASE archived")
+
+        raw.execute("BEGIN IMMEDIATE")
+        if "AUTOINCREMENT" in raw.execute(table_sql).fetchone()[0].upper():
+            # Another process rebuilt it first
+            raw.rollback()
+            return False
+        table = Attempt.__table__
+        columns = ", ".join(c.name for c in table.columns)
+        raw.execute("ALTER TABLE attempts RENAME TO attempts_before_autoincrement")
+        raw.execute(str(CreateTable(table).compile(dialect=bind.dialect)))
+        raw.execute(f"INSERT INTO attempts ({columns}) SELECT {columns} FROM attempts_before_autoincrement")
+        # Drops the old indexes too, so they can be created on the new table
+        raw.execute("DROP TABLE attempts_before_autoincrement")
+        for table_index in table.indexes:
+            raw.execute(str(CreateIndex(table_index).compile(dialect=bind.dialect)))
+        raw.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'attempts', 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'attempts')"
+        )
+        raw.execute(
+            "UPDATE sqlite_sequence SET seq = ? WHERE name = 'attempts' AND seq < ?",
+            (archived_max, archived_max),
+        )
+        raw.commit()
+        return True
+    finally:
+        raw.close()
+
+
 def init_db():
     """
     Create tables and populate static question bank if empty.
@@ -77,6 +301,8 @@ def init_db():
     Also creates a default test user.
     """
     Base.metadata.create_all(bind=engine)
+    if upgrade_attempts_table(engine):
+        print("✓ Rebuilt attempts table with AUTOINCREMENT ids")
     db = SessionLocal()
     try:
         # Create default user if doesn't exist
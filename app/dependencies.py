@@ -0,0 +1,49 @@
+"""
+Shared FastAPI dependencies.
+
+- Resolves the signed session token from the cookie or an
+  "Authorization: Bearer" header without touching the database.
+- get_owned_session checks that a test session belongs to the caller.
+"""
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from .config import ADMIN_USERNAMES, SESSION_COOKIE_NAME
+from .services.session_service import SessionService
+from .services.token_service import TokenService, TokenUser
+
+
+def get_token(conn: HTTPConnection) -> Optional[str]:
+    """Token from "Authorization: Bearer" or the session cookie (HTTP or WebSocket)."""
+    auth_header = conn.headers.get("authorization", "")
+    if auth_header.lower().startswith("bearer "):
+        return auth_header[7:].strip()
+    return conn.cookies.get(SESSION_COOKIE_NAME)
+
+
+def get_optional_user(request: Request) -> Optional[TokenUser]:
+    return TokenService.verify_token(get_token(request))
+
+
+def get_current_user(user: Optional[TokenUser] = Depends(get_optional_user)) -> TokenUser:
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+
+def get_admin_user(user: TokenUser = Depends(get_current_user)) -> TokenUser:
+    if user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+def get_owned_session(session_id: int, user: TokenUser = Depends(get_current_user)) -> dict:
+    session = SessionService.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session["user_id"] != user.id:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+    return session
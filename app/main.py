@@ -4,13 +4,17 @@ FastAPI application initialization for IntelliPrep.
 - Creates DB tables on startup.
 - Loads ML model for inference.
 - Includes routers and serves static files & templates.
+- Applies admission control / load shedding to test-flow endpoints.
+- Records slow requests (timing + SQL) on every route.
 """
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from .admission import AdmissionMiddleware, admission
 from .db import init_db
+from .profiling import SlowRequestMiddleware
 from .test_engine.model_loader import ModelLoader
 
 # Routers
@@ -18,8 +22,14 @@ from .routers import auth as auth_router
 from .routers import pages as pages_router
 from .routers import test_api as test_api_router
 from .routers import test_pages as test_pages_router
+from .routers import test_stream as test_stream_router
+from .routers import export_api as export_api_router
+from .routers import admin_api as admin_api_router
 
 app = FastAPI(title="IntelliPrep - Adaptive Assessment")
+# Added first, so it runs inside admission control and times the handler, not the queue
+app.add_middleware(SlowRequestMiddleware)
+app.add_middleware(AdmissionMiddleware, controller=admission)
 
 # Mount static directory
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -39,4 +49,7 @@ def startup_event():
 app.include_router(auth_router.router, prefix="/auth")
 app.include_router(pages_router.router, prefix="")
 app.include_router(test_pages_router.router, prefix="/test")
-app.include_router(test_api_router.router, prefix="/api")
\ No newline at end of file
+app.include_router(test_api_router.router, prefix="/api")
+app.include_router(test_stream_router.router, prefix="/api")
+app.include_router(export_api_router.router, prefix="/api")
+app.include_router(admin_api_router.router, prefix="/api")
\ No newline at end of file
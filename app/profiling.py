@@ -0,0 +1,343 @@
+"""
+Production profiling: on-demand stack sampling and slow-request capture.
+
+- StackSampler: a daemon thread reads sys._current_frames() every few
+  milliseconds for N seconds and counts collapsed stacks
+  ("outer;...;inner count" lines, ready for flamegraph.pl / speedscope).
+  Nothing is traced between samples, so overhead is one stack walk per
+  thread per tick, and only while a profile is running.
+- SlowRequestRecorder + @capture_slow: wrapped handlers record their SQL
+  statements (text and duration only, never parameters) and, for a sampled
+  fraction of calls, run under cProfile. Calls slower than the threshold
+  keep a JSON summary and, when profiled, a .prof dump in PROFILE_DIR;
+  only the newest SLOW_REQUEST_KEEP captures are kept.
+- SlowRequestMiddleware does the same timing and SQL capture for every
+  HTTP request (time until the response headers are sent, so streams are
+  not counted as slow), so slow routes without @capture_slow are recorded
+  too. A request whose decorated handler already kept a capture is not
+  recorded twice.
+- @capture_slow wraps the sync handler body (which runs in a threadpool
+  thread) rather than the ASGI request. Before Python 3.12 cProfile only
+  sees the thread it was enabled on. From 3.12 it is built on
+  sys.monitoring: it records every thread and only one profiler can be
+  active per process, so profiled calls are serialized (a call that finds
+  the profiler busy is not profiled) and the capture is marked
+  "profile_scope": "process" - its .prof includes other threads' frames.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import (
+    PROFILE_DIR,
+    SLOW_REQUEST_KEEP,
+    SLOW_REQUEST_PROFILE_RATE,
+    SLOW_REQUEST_THRESHOLD_MS,
+)
+
+# Innermost frames that mean a thread is blocked, not working
+IDLE_FUNCTIONS = {"wait", "select", "poll", "accept", "_wait_for_tstate_lock"}
+# Statements kept per captured request
+MAX_CAPTURED_STATEMENTS = 500
+# Per-call cProfile is only scoped to the calling thread before 3.12
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+# From 3.12, held by the one call being profiled in this process
+_cprofile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            self._sample()
+            self.samples += 1
+            spent = time.perf_counter() - started
+            self.sampling_seconds += spent
+            self._stop.wait(max(self.interval - spent, 0.0))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def report(self, duration: float) -> Dict:
+        return {
+            "duration_seconds": duration,
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            # Fraction of wall time the sampler itself spent walking stacks
+            "sampler_overhead": self.sampling_seconds / duration if duration else 0.0,
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+
+# Only one sampling profile at a time
+sampler_lock = threading.Lock()
+
+
+# Per-call SQL capture: list of statements while a wrapped handler runs
+_sql_capture: ContextVar[Optional[List[Dict]]] = ContextVar("sql_capture", default=None)
+# Set by SlowRequestMiddleware; @capture_slow marks it once it kept a capture
+_request_capture: ContextVar[Optional[Dict]] = ContextVar("request_capture", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sql_capture.get() is not None:
+        conn.info.setdefault("capture_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _sql_capture.get()
+    started = conn.info.get("capture_started")
+    if statements is None or not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000.0
+    if len(statements) < MAX_CAPTURED_STATEMENTS:
+        statements.append({"statement": statement, "executemany": executemany, "ms": round(elapsed_ms, 3)})
+
+
+class SlowRequestRecorder:
+    """Keeps the newest slow-call captures on disk and their summaries in memory."""
+
+    def __init__(
+        self,
+        directory: Path = PROFILE_DIR,
+        threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS,
+        profile_rate: float = SLOW_REQUEST_PROFILE_RATE,
+        keep: int = SLOW_REQUEST_KEEP,
+    ):
+        self.directory = Path(directory)
+        self.threshold_ms = threshold_ms
+        self.profile_rate = profile_rate
+        self.keep = keep
+        self._captures: deque = deque()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration_ms: float, statements: List[Dict], profiler: Optional[cProfile.Profile]):
+        with self._lock:
+            capture_id = self._next_id
+            self._next_id += 1
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+        base = self.directory / f"{capture_id:06d}-{stamp}-{safe_name}"
+        summary = {
+            "id": capture_id,
+            "name": name,
+            "at": stamp,
+            "duration_ms": round(duration_ms, 3),
+            "sql_count": len(statements),
+            "sql_ms": round(sum(s["ms"] for s in statements), 3),
+            "profile": None,
+            # "process": the dump also holds other threads' frames (3.12+)
+            "profile_scope": None,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if profiler is not None:
+            profiler.dump_stats(str(base.with_suffix(".prof")))
+            summary["profile"] = str(base.with_suffix(".prof"))
+            summary["profile_scope"] = "thread" if CPROFILE_PER_THREAD else "process"
+        with open(base.with_suffix(".json"), "w") as f:
+            json.dump(dict(summary, sql=statements), f, indent=2)
+
+        with self._lock:
+            self._captures.append((summary, base))
+            evicted = []
+            while len(self._captures) > self.keep:
+                evicted.append(self._captures.popleft()[1])
+        for old in evicted:
+            for suffix in (".prof", ".json"):
+                try:
+                    os.remove(old.with_suffix(suffix))
+                except FileNotFoundError:
+                    pass
+
+    def captures(self) -> List[Dict]:
+        with self._lock:
+            return [summary for summary, _ in reversed(self._captures)]
+
+    def get(self, capture_id: int) -> Optional[Dict]:
+        with self._lock:
+            bases = [base for summary, base in self._captures if summary["id"] == capture_id]
+        if not bases:
+            return None
+        with open(bases[0].with_suffix(".json")) as f:
+            return json.load(f)
+
+    def settings(self) -> Dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "profile_rate": self.profile_rate,
+            # "process": one profiled call at a time, dumps include other threads
+            "profile_scope": "thread" if CPROFILE_PER_THREAD else "process",
+            "keep": self.keep,
+            "directory": str(self.directory),
+        }
+
+
+# Shared recorder used by @capture_slow and the admin endpoints
+slow_requests = SlowRequestRecorder()
+
+
+def _start_profiler(profile_rate: float) -> Optional[cProfile.Profile]:
+    """A running profiler for a sampled call, or None."""
+    if profile_rate <= 0 or random.random() >= profile_rate:
+        return None
+    if not CPROFILE_PER_THREAD and not _cprofile_lock.acquire(blocking=False):
+        # Another call is being profiled (process-wide from 3.12)
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread / process
+        _stop_profiler(None)
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: Optional[cProfile.Profile]):
+    if profiler is not None:
+        profiler.disable()
+    if not CPROFILE_PER_THREAD:
+        _cprofile_lock.release()
+
+
+def capture_slow(name: str):
+    """
+    Decorator for sync handlers: capture SQL (and, for a sampled fraction of
+    calls, a cProfile run) and keep it if the call exceeds the threshold.
+    A threshold <= 0 disables capture.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = slow_requests
+            if recorder.threshold_ms <= 0:
+                return fn(*args, **kwargs)
+            outer = _sql_capture.get()
+            statements: List[Dict] = []
+            token = _sql_capture.set(statements)
+            profiler = _start_profiler(recorder.profile_rate)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000.0
+                if profiler is not None:
+                    _stop_profiler(profiler)
+                _sql_capture.reset(token)
+                if outer is not None:
+                    # Keep the request-level capture complete
+                    outer.extend(statements[: MAX_CAPTURED_STATEMENTS - len(outer)])
+                if duration_ms >= recorder.threshold_ms:
+                    try:
+                        recorder.record(name, duration_ms, statements, profiler)
+                        request = _request_capture.get()
+                        if request is not None:
+                            request["recorded"] = True
+                    except OSError:
+                        # Never fail the request because a capture could not be written
+                        pass
+
+        return wrapper
+
+    return decorator
+
+
+class SlowRequestMiddleware:
+    """
+    ASGI middleware: SQL capture and timing for every HTTP request, kept by
+    the shared recorder when slower than its threshold.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        recorder = slow_requests
+        if scope["type"] != "http" or recorder.threshold_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        statements: List[Dict] = []
+        request = {"recorded": False}
+        sql_token = _sql_capture.set(statements)
+        request_token = _request_capture.set(request)
+        started = time.perf_counter()
+        first_byte = []
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and not first_byte:
+                first_byte.append(time.perf_counter())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _sql_capture.reset(sql_token)
+            _request_capture.reset(request_token)
+            duration_ms = ((first_byte[0] if first_byte else time.perf_counter()) - started) * 1000.0
+            if 0 < recorder.threshold_ms <= duration_ms and not request["recorded"]:
+                endpoint = scope.get("endpoint")
+                name = f"http {scope['method']} {getattr(endpoint, '__name__', scope['path'])}"
+                try:
+                    recorder.record(name, duration_ms, statements, None)
+                except OSError:
+                    # Never fail the request because a capture could not be written
+                    pass
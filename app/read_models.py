@@ -0,0 +1,93 @@
+"""
+Lightweight read models for hot paths.
+
+- QuestionMeta and AttemptRecord are read-only tuples (no per-instance
+  __dict__) built from column-only Core selects, so no ORM identity-map
+  bookkeeping and no text/options blobs are loaded.
+- The full Question row (text/options) is loaded only for the one
+  question that is actually served.
+- The question bank is static at runtime, so question metadata is read once
+  per engine into an in-process catalog (call QuestionCatalog.invalidate()
+  after editing questions).
+"""
+
+import threading
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, undefer_group
+
+from .db import Attempt, Question
+
+
+class QuestionMeta(NamedTuple):
+    id: int
+    domain: str
+    difficulty: str
+
+
+class AttemptRecord(NamedTuple):
+    """Shaped like Attempt for SkillService: .correct, .time_taken, .question."""
+
+    correct: bool
+    time_taken: float
+    question: QuestionMeta
+
+
+class QuestionCatalog:
+    """In-process cache of QuestionMeta for the whole bank, per engine."""
+
+    _bind = None
+    _questions: Tuple[QuestionMeta, ...] = ()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db: Session) -> Tuple[QuestionMeta, ...]:
+        bind = db.get_bind()
+        if cls._bind is bind:
+            return cls._questions
+        with cls._lock:
+            if cls._bind is not bind:
+                stmt = select(Question.id, Question.domain, Question.difficulty).order_by(Question.id)
+                cls._questions = tuple(QuestionMeta._make(row) for row in db.execute(stmt))
+                cls._bind = bind
+            return cls._questions
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._bind = None
+            cls._questions = ()
+
+
+def load_question_meta(db: Session, exclude: Iterable[int] = ()) -> List[QuestionMeta]:
+    """
+    id/domain/difficulty for every question not in `exclude`.
+    """
+    exclude = set(exclude)
+    return [q for q in QuestionCatalog.get(db) if q.id not in exclude]
+
+
+def load_attempt_records(db: Session, user_id: int) -> List[AttemptRecord]:
+    stmt = (
+        select(
+            Attempt.correct,
+            Attempt.time_taken,
+            Question.id,
+            Question.domain,
+            Question.difficulty,
+        )
+        .join(Question, Question.id == Attempt.question_id)
+        .where(Attempt.user_id == user_id)
+    )
+    return [
+        AttemptRecord(correct, time_taken, QuestionMeta(qid, domain, difficulty))
+        for correct, time_taken, qid, domain, difficulty in db.execute(stmt)
+    ]
+
+
+def load_question(db: Session, question_id: int) -> Optional[Question]:
+    """
+    Full Question row including the deferred text/options, in one query.
+    """
+    return db.get(Question, question_id, options=[undefer_group("content")])
@@ -0,0 +1,137 @@
+"""
+Admin-only operational endpoints:
+- GET /api/admin/admission : admission-control queue depth and rejection counters
+- POST /api/admin/exams : schedule a cohort exam (sessions pre-warmed before start)
+- GET /api/admin/exams : scheduled exams with warm-up / claim progress
+- DELETE /api/admin/exams/{exam_id} : cancel an exam and release unclaimed sessions
+- GET /api/admin/inference : inference micro-batching batch sizes and queueing delay
+- GET /api/admin/profile : sample all thread stacks for N seconds (collapsed stacks)
+- GET /api/admin/slow_requests : slow-request capture settings and recent captures
+- PUT /api/admin/slow_requests : change the threshold / cProfile sampling rate
+- GET /api/admin/slow_requests/{capture_id} : SQL list of one capture
+- GET /api/admin/slow_requests/{capture_id}/profile : its cProfile dump (.prof)
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from ..admission import admission
+from ..config import EXAM_PREWARM_LEAD_SECONDS, PROFILER_MAX_SECONDS
+from ..dependencies import get_admin_user
+from ..profiling import StackSampler, sampler_lock, slow_requests
+from ..services.exam_service import ExamService
+from ..test_engine.model_loader import ModelLoader
+
+router = APIRouter()
+
+
+class ScheduleExamRequest(BaseModel):
+    name: str
+    start_at: datetime
+    usernames: List[str]
+    prewarm_lead_seconds: Optional[int] = None
+
+
+class SlowRequestSettings(BaseModel):
+    threshold_ms: Optional[float] = None
+    profile_rate: Optional[float] = None
+
+
+@router.get("/admin/admission")
+def admission_stats(_admin=Depends(get_admin_user)):
+    return admission.stats()
+
+
+@router.get("/admin/inference")
+def inference_stats(_admin=Depends(get_admin_user)):
+    return ModelLoader.batching_stats()
+
+
+@router.post("/admin/exams", status_code=201)
+def schedule_exam(payload: ScheduleExamRequest, _admin=Depends(get_admin_user)):
+    lead = payload.prewarm_lead_seconds
+    return ExamService.schedule_exam(
+        payload.name,
+        payload.start_at,
+        payload.usernames,
+        prewarm_lead_seconds=EXAM_PREWARM_LEAD_SECONDS if lead is None else lead,
+    )
+
+
+@router.get("/admin/exams")
+def list_exams(_admin=Depends(get_admin_user)):
+    return ExamService.list_exams()
+
+
+@router.delete("/admin/exams/{exam_id}")
+def cancel_exam(exam_id: int, _admin=Depends(get_admin_user)):
+    exam = ExamService.close_exam(exam_id)
+    if exam is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return exam
+
+
+@router.get("/admin/profile")
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    idle: bool = False,
+    _admin=Depends(get_admin_user),
+):
+    """
+    Sample every thread's stack for `seconds`. The sampler runs on its own
+    thread while this handler only sleeps, so no worker is tied up.
+    """
+    if not sampler_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        sampler = StackSampler(interval=interval_ms / 1000.0, include_idle=idle)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started
+    finally:
+        sampler_lock.release()
+    if format == "json":
+        return sampler.report(duration)
+    return PlainTextResponse(sampler.collapsed())
+
+
+@router.get("/admin/slow_requests")
+def list_slow_requests(_admin=Depends(get_admin_user)):
+    return {"settings": slow_requests.settings(), "captures": slow_requests.captures()}
+
+
+@router.put("/admin/slow_requests")
+def update_slow_requests(payload: SlowRequestSettings, _admin=Depends(get_admin_user)):
+    if payload.threshold_ms is not None:
+        slow_requests.threshold_ms = max(payload.threshold_ms, 0.0)
+    if payload.profile_rate is not None:
+        slow_requests.profile_rate = min(max(payload.profile_rate, 0.0), 1.0)
+    return slow_requests.settings()
+
+
+@router.get("/admin/slow_requests/{capture_id}")
+def get_slow_request(capture_id: int, _admin=Depends(get_admin_user)):
+    capture = slow_requests.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return capture
+
+
+@router.get("/admin/slow_requests/{capture_id}/profile")
+def get_slow_request_profile(capture_id: int, _admin=Depends(get_admin_user)):
+    capture = slow_requests.get(capture_id)
+    if capture is None or not capture["profile"]:
+        raise HTTPException(status_code=404, detail="No profile for this capture")
+    return FileResponse(capture["profile"], media_type="application/octet-stream")
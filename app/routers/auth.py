@@ -1,7 +1,8 @@
 """
 Authentication router - simple register & login.
 
-Uses forms for demonstration and session-less responses.
+Uses forms for demonstration. A successful login sets a signed,
+stateless session token cookie (see TokenService).
 This is intentionally minimal to keep focus on adaptive engine.
 """
 
@@ -9,7 +10,9 @@ from fastapi import APIRouter, Request, Form
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
+from ..config import SESSION_COOKIE_NAME, TOKEN_TTL_SECONDS
 from ..services.auth_service import AuthService
+from ..services.token_service import TokenService
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -40,8 +43,25 @@ def login_page(request: Request):
 def login(request: Request, username: str = Form(...), password: str = Form(...)):
     ok, user_or_msg = AuthService.authenticate_user(username, password)
     if ok:
-        # For simplicity we redirect to dashboard with ?user={username}
-        return RedirectResponse(url=f"/dashboard?user={user_or_msg.username}", status_code=303)
+        # Identity travels in the signed token cookie, not the query string
+        token = TokenService.issue_token(user_or_msg.id, user_or_msg.username)
+        response = RedirectResponse(url="/dashboard", status_code=303)
+        response.set_cookie(
+            SESSION_COOKIE_NAME,
+            token,
+            max_age=TOKEN_TTL_SECONDS,
+            httponly=True,
+            samesite="lax",
+            secure=request.url.scheme == "https",
+        )
+        return response
     return templates.TemplateResponse(
         "auth/login.html", {"request": request, "error": user_or_msg}
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/logout")
+def logout():
+    response = RedirectResponse(url="/", status_code=303)
+    response.delete_cookie(SESSION_COOKIE_NAME)
+    return response
@@ -0,0 +1,54 @@
+"""
+Export endpoints for analytics (admin only):
+- GET /api/export/attempts : stream attempts joined with question metadata
+- GET /api/export/stats : stream per-user/domain/difficulty aggregates
+- GET /api/export/rollups : stream monthly rollups of compacted periods
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..dependencies import get_admin_user
+from ..services.export_service import EXPORT_KINDS, ExportService
+
+router = APIRouter()
+
+
+@router.get("/export/{kind}")
+def export(
+    kind: str,
+    format: str = "csv",
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    domain: Optional[str] = None,
+    _admin=Depends(get_admin_user),
+):
+    """
+    Stream the export in constant memory; filters are applied in SQL.
+    """
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    error = ExportService.check_format(format) or ExportService.check_range(kind, start, end)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    chunks = ExportService.stream(
+        kind=kind,
+        fmt=format,
+        gzip=gzip,
+        user_id=user_id,
+        start=start,
+        end=end,
+        domain=domain,
+    )
+    filename = ExportService.filename(kind, format, gzip)
+    return StreamingResponse(
+        chunks,
+        media_type=ExportService.media_type(format, gzip),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
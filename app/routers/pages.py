@@ -4,14 +4,13 @@ Static pages and dashboard.
 Dashboard shows simple user stats and link to start test.
 """
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.templating import Jinja2Templates
 from typing import Optional
 
+from ..dependencies import get_optional_user
 from ..services.skill_service import SkillService
-from ..services.attempt_service import AttemptService
-from ..db import SessionLocal
-from ..db import User
+from ..services.token_service import TokenUser
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -23,23 +22,14 @@ def root(request: Request):
 
 
 @router.get("/dashboard")
-def dashboard(request: Request, user: Optional[str] = None):
+def dashboard(request: Request, user: Optional[TokenUser] = Depends(get_optional_user)):
     """
-    Simple dashboard using query parameter 'user' for demonstration.
-    In production, use secure sessions / tokens.
+    Dashboard for the user identified by the session token cookie.
     """
     stats = {}
-    user_obj = None
     if user:
-        db = SessionLocal()
-        try:
-            user_obj = db.query(User).filter(User.username == user).first()
-            if user_obj:
-                attempts = AttemptService.get_attempts_by_user(user_obj.id)
-                stats = SkillService.compute_overall_stats(attempts)
-        finally:
-            db.close()
+        stats = SkillService.get_user_stats(user.id)
     return templates.TemplateResponse(
         "dashboard.html",
-        {"request": request, "user": user_obj, "stats": stats},
+        {"request": request, "user": user, "stats": stats},
     )
\ No newline at end of file
@@ -2,106 +2,173 @@
 API endpoints for test flow:
 - GET /api/next_question/{session_id} : returns next question JSON
 - POST /api/submit_answer : accepts answer and stores attempt, returns next question or completion
+- POST /api/submit_answers : ordered batch of answers for one or many sessions (offline uploads)
 """
 
-from fastapi import APIRouter, HTTPException
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from ..config import ADMIN_USERNAMES, SUBMIT_ANSWERS_MAX_BATCH
+from ..dependencies import get_current_user, get_owned_session
+from ..profiling import capture_slow
+from ..services.question_flow_service import QuestionFlowService
 from ..services.session_service import SessionService
-from ..services.attempt_service import AttemptService
 from ..services.skill_service import SkillService
-from ..test_engine.baseline_generator import BaselineGenerator
-from ..test_engine.adaptive_generator import AdaptiveGenerator
-from ..db import SessionLocal, Question, User
-from ..test_engine.model_loader import ModelLoader
+from ..services.token_service import TokenUser
+from ..db import SessionLocal, User
 
 router = APIRouter()
 
 
 class SubmitAnswerRequest(BaseModel):
     session_id: int
-    username: str
     question_id: int
     selected_option: int
     time_taken: float
 
 
+class BatchAnswer(BaseModel):
+    session_id: int
+    question_id: int
+    selected_option: int
+    time_taken: float
+    # When the answer was given offline (defaults to upload time)
+    answered_at: Optional[datetime] = None
+    # Whose answer it is; lets proctors upload for sessions the server no
+    # longer holds (completed, or lost in a restart)
+    user_id: Optional[int] = None
+
+
+class SubmitAnswersRequest(BaseModel):
+    answers: List[BatchAnswer]
+
+
 @router.get("/next_question/{session_id}")
-def api_next_question(session_id: int, username: Optional[str] = None):
+@capture_slow("next_question")
+def api_next_question(session_id: int, user: TokenUser = Depends(get_current_user)):
     """
     Returns next question for the given session.
     On diagnostic phase, baseline generator supplies questions.
     After that adaptive generator chooses questions using ML predictions.
     """
-    session = SessionService.get_session(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = get_owned_session(session_id, user)
 
     db = SessionLocal()
     try:
-        user = db.query(User).filter(User.username == session["username"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # If session in diagnostic mode, use baseline; after diagnostic use adaptive
-        if not session.get("diagnostic_done"):
-            q = BaselineGenerator.next_question(db, session)
-            if q is None:
-                # mark diagnostic done
-                SessionService.mark_diagnostic_done(session_id)
-                # fallback to adaptive selection
-                q = AdaptiveGenerator.next_question(db, user.id, session)
-        else:
-            q = AdaptiveGenerator.next_question(db, user.id, session)
-
+        q = QuestionFlowService.select_next_question(db, session_id, session, user.id)
         if q is None:
             return {"complete": True}
-        return {
-            "complete": False,
-            "question": {
-                "id": q.id,
-                "text": q.text,
-                "options": q.get_options(),
-                "difficulty": q.difficulty,
-                "domain": q.domain,
-            },
-        }
+        return {"complete": False, "question": QuestionFlowService.serialize_question(q)}
     finally:
         db.close()
 
 
 @router.post("/submit_answer")
-def submit_answer(payload: SubmitAnswerRequest):
+@capture_slow("submit_answer")
+def submit_answer(payload: SubmitAnswerRequest, user: TokenUser = Depends(get_current_user)):
     """
     Store attempt, recompute stats and return next question hint.
     """
+    get_owned_session(payload.session_id, user)
+
     db = SessionLocal()
     try:
-        user = db.query(User).filter(User.username == payload.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        question = db.query(Question).get(payload.question_id)
-        if not question:
-            raise HTTPException(status_code=404, detail="Question not found")
-
-        correct = payload.selected_option == question.correct_option
-        # Store attempt
-        AttemptService.record_attempt(
+        correct = QuestionFlowService.record_answer(
+            db,
+            session_id=payload.session_id,
             user_id=user.id,
-            question_id=question.id,
-            correct=correct,
+            question_id=payload.question_id,
+            selected_option=payload.selected_option,
             time_taken=payload.time_taken,
         )
-
-        # Add to session record
-        SessionService.add_attempt_to_session(payload.session_id, question.id)
+        if correct is None:
+            raise HTTPException(status_code=404, detail="Question not found")
 
         # After storing attempt we can compute stats (used by adaptive generator)
-        attempts = AttemptService.get_attempts_by_user(user.id)
-        stats = SkillService.compute_overall_stats(attempts)
+        stats = SkillService.get_user_stats(user.id)
 
         # For convenience return correctness and a next_question flag
         next_info = {"correct": correct, "stats": stats}
         return next_info
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@router.post("/submit_answers")
+@capture_slow("submit_answers")
+def submit_answers(payload: SubmitAnswersRequest, user: TokenUser = Depends(get_current_user)):
+    """
+    Store an ordered batch of answers collected offline.
+    Answers are stored for the session's user, or for `user_id` when given:
+    admins (proctors) may name any user, others only themselves. A session
+    the server no longer holds (or, for proctors, that now belongs to someone
+    else) still gets its answers stored; only its in-memory session state is skipped,
+    and it is listed in "skipped_sessions". The whole batch is rejected if a
+    question or user is unknown. Stats are computed once per affected user.
+    """
+    answers = payload.answers
+    if len(answers) > SUBMIT_ANSWERS_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {SUBMIT_ANSWERS_MAX_BATCH} answers per batch")
+
+    is_admin = user.username in ADMIN_USERNAMES
+    named_users: Dict[int, Set[int]] = defaultdict(set)
+    for a in answers:
+        if a.user_id is not None:
+            if not is_admin and a.user_id != user.id:
+                raise HTTPException(status_code=403, detail="Only admins may upload answers for other users")
+            named_users[a.session_id].add(a.user_id)
+
+    session_users = {}
+    live_sessions = set()
+    for session_id in {a.session_id for a in answers}:
+        named = named_users.get(session_id, set())
+        if len(named) > 1:
+            raise HTTPException(status_code=400, detail=f"Answers for session {session_id} name several users")
+        session = SessionService.get_session(session_id)
+        owner = session["user_id"] if session is not None else None
+        if not is_admin and owner not in (None, user.id):
+            raise HTTPException(status_code=403, detail="Session belongs to another user")
+        if named:
+            user_id = next(iter(named))
+        elif not is_admin:
+            user_id = user.id
+        elif owner is not None:
+            user_id = owner
+        else:
+            raise HTTPException(
+                status_code=404, detail=f"Session {session_id} not found; send user_id with its answers"
+            )
+        session_users[session_id] = user_id
+        if owner == user_id:
+            live_sessions.add(session_id)
+
+    db = SessionLocal()
+    try:
+        answer_keys = QuestionFlowService.load_answer_keys(db, (a.question_id for a in answers))
+        user_ids = set(session_users.values())
+        known_users = {uid for (uid,) in db.query(User.id).filter(User.id.in_(user_ids))}
+    finally:
+        db.close()
+    missing = sorted({a.question_id for a in answers} - answer_keys.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Questions not found", "question_ids": missing})
+    missing_users = sorted(user_ids - known_users)
+    if missing_users:
+        raise HTTPException(status_code=404, detail={"message": "Users not found", "user_ids": missing_users})
+
+    results = QuestionFlowService.record_answers(
+        [dict(a.model_dump(), user_id=session_users[a.session_id]) for a in answers],
+        answer_keys,
+        live_sessions,
+    )
+    stats = {user_id: SkillService.get_user_stats(user_id) for user_id in user_ids}
+    return {
+        "count": len(results),
+        "correct": results,
+        "stats": stats,
+        # Answers stored, but no in-memory session state to update
+        "skipped_sessions": sorted(set(session_users) - live_sessions),
+    }
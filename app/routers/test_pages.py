@@ -2,12 +2,17 @@
 HTML flows for starting tests, viewing questions, and completion.
 """
 
-from fastapi import APIRouter, Request, Form
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
+from ..dependencies import get_optional_user, get_owned_session
+from ..services.exam_service import ExamService
 from ..services.session_service import SessionService
 from ..services.attempt_service import AttemptService
+from ..services.token_service import TokenUser
 from ..db import SessionLocal, User, Question
 
 router = APIRouter()
@@ -15,17 +20,19 @@ templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/start")
-def start_test(request: Request, user: str = None):
+def start_test(request: Request, user: Optional[TokenUser] = Depends(get_optional_user)):
     """
-    Start a new test session for a user.
+    Start a new test session for the logged-in user.
     For diagnostic test we will use baseline generator via API endpoints.
     """
     if not user:
         return RedirectResponse(url="/auth/login")
-    # Create a session id (simple integer) and redirect to first question
-    session_id = SessionService.create_session(user)
-    # Include the username in the redirect query string so the question page's JS can pick it up.
-    return RedirectResponse(url=f"/test/question/{session_id}?user={user}", status_code=303)
+    # Scheduled exam members get their pre-allocated session; otherwise
+    # create a session id (simple integer) and redirect to first question
+    session_id = ExamService.claim_session(user.id)
+    if session_id is None:
+        session_id = SessionService.create_session(user.id, user.username)
+    return RedirectResponse(url=f"/test/question/{session_id}", status_code=303)
 
 
 @router.get("/question/{session_id}")
@@ -40,9 +47,14 @@ def show_question(request: Request, session_id: int):
 
 
 @router.get("/complete/{session_id}")
-def complete(request: Request, session_id: int):
+def complete(
+    request: Request,
+    session_id: int,
+    session: dict = Depends(get_owned_session),
+):
     """
     Show a simple completion page with session summary.
+    Only the session's owner can end it (get_owned_session authenticates).
     """
     summary = SessionService.end_session(session_id)
     return templates.TemplateResponse(
@@ -0,0 +1,234 @@
+"""
+Persistent question/answer channel for a test session.
+
+- WS /api/ws/session/{session_id} : authenticate once, then exchange
+  compact answer / next-question messages on one socket.
+- GET /api/stream/{session_id}/events + POST /api/stream/{session_id}/answer :
+  SSE + POST fallback for clients that cannot open a WebSocket.
+
+The resolved user, session and last served question are kept in memory for
+the connection, so each answer costs one attempt insert plus one question
+selection - no user/session lookups or stats recompute.
+
+Each start/answer on an open channel goes through admission control with the
+next_question / submit_answer priorities. When shed, the socket gets a
+"busy" message (the client retries after "r" seconds) and the SSE stream
+ends with a retry hint so the browser reconnects.
+
+Clients reconnect with backoff when a channel drops and resend the answer
+that was in flight; an answer to a question the session already recorded
+is graded again but not stored twice.
+
+Messages (JSON):
+- client -> server: {"q": question_id, "o": selected_option, "s": seconds}
+- server -> client: {"t": "q", "q": {...question...}, "c": previous_correct?}
+                    {"t": "done", "c": previous_correct?}
+                    {"t": "err", "d": detail}
+                    {"t": "busy", "d": detail, "r": retry_after_seconds}
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..admission import admission
+from ..db import SessionLocal
+from ..dependencies import get_current_user, get_owned_session, get_token
+from ..profiling import capture_slow
+from ..services.question_flow_service import QuestionFlowService
+from ..services.session_service import SessionService
+from ..services.token_service import TokenService, TokenUser
+
+router = APIRouter()
+
+# Seconds between SSE keep-alive comments
+SSE_KEEPALIVE_SECONDS = 15
+BUSY_DETAIL = "Server busy, please retry shortly"
+
+
+class _Channel:
+    """State for one open test-session connection."""
+
+    def __init__(self, session_id: int, session: dict, user: TokenUser):
+        self.session_id = session_id
+        self.session = session
+        self.user = user
+        # (question_id, correct_option) of the question last served
+        self.pending: Optional[Tuple[int, int]] = None
+        self.lock = asyncio.Lock()
+
+    def _next_message(self, db) -> Dict[str, Any]:
+        q = QuestionFlowService.select_next_question(db, self.session_id, self.session, self.user.id)
+        if q is None:
+            self.pending = None
+            return {"t": "done"}
+        self.pending = (q.id, q.correct_option)
+        return {"t": "q", "q": QuestionFlowService.serialize_question(q)}
+
+    @capture_slow("channel_start")
+    def start(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return self._next_message(db)
+        finally:
+            db.close()
+
+    @capture_slow("channel_answer")
+    def answer(self, msg: Any) -> Dict[str, Any]:
+        try:
+            question_id = int(msg["q"])
+            selected_option = int(msg["o"])
+            time_taken = float(msg.get("s", 0.0))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return {"t": "err", "d": "Expected {q, o, s}"}
+
+        # The served question's answer key is already in memory
+        known = self.pending[1] if self.pending and self.pending[0] == question_id else None
+        db = SessionLocal()
+        try:
+            if question_id in self.session["attempted"]:
+                # Resent after a reconnect and already stored: only grade it
+                keys = QuestionFlowService.load_answer_keys(db, [question_id])
+                correct = selected_option == keys[question_id] if question_id in keys else None
+            else:
+                correct = QuestionFlowService.record_answer(
+                    db,
+                    session_id=self.session_id,
+                    user_id=self.user.id,
+                    question_id=question_id,
+                    selected_option=selected_option,
+                    time_taken=time_taken,
+                    correct_option=known,
+                )
+            if correct is None:
+                return {"t": "err", "d": "Question not found"}
+            reply = self._next_message(db)
+            reply["c"] = correct
+            return reply
+        finally:
+            db.close()
+
+
+async def _admitted(rule_name: str, fn, *args) -> Optional[Dict[str, Any]]:
+    """
+    Run a channel call in the threadpool under the named admission rule.
+    Returns None when the call was shed.
+    """
+    rule = admission.rule(rule_name)
+    if await admission.acquire(rule):
+        return None
+    try:
+        return await run_in_threadpool(fn, *args)
+    finally:
+        admission.release(rule)
+
+
+def _busy_message() -> Dict[str, Any]:
+    return {"t": "busy", "d": BUSY_DETAIL, "r": admission.retry_after}
+
+
+@router.websocket("/ws/session/{session_id}")
+async def session_socket(websocket: WebSocket, session_id: int):
+    user = TokenService.verify_token(get_token(websocket))
+    session = SessionService.get_session(session_id)
+    if user is None or session is None or session["user_id"] != user.id:
+        # Rejects the handshake
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    channel = _Channel(session_id, session, user)
+    try:
+        reply = await _admitted("next_question", channel.start)
+        if reply is None:
+            # The client reconnects after the hinted delay
+            await websocket.send_json(_busy_message())
+            await websocket.close(code=1013)
+            return
+        await websocket.send_json(reply)
+        while reply["t"] != "done":
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"t": "err", "d": "Invalid JSON"})
+                continue
+            answered = await _admitted("submit_answer", channel.answer, msg)
+            if answered is None:
+                # Not recorded; the client resends the same answer
+                await websocket.send_json(_busy_message())
+                continue
+            reply = answered
+            await websocket.send_json(reply)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+# session_id -> (channel, outgoing message queue) for open SSE streams
+_sse_channels: Dict[int, Tuple[_Channel, asyncio.Queue]] = {}
+
+
+def _sse_event(msg: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(msg, separators=(',', ':'))}\n\n"
+
+
+@router.get("/stream/{session_id}/events")
+async def session_events(
+    session_id: int,
+    user: TokenUser = Depends(get_current_user),
+    session: dict = Depends(get_owned_session),
+):
+    channel = _Channel(session_id, session, user)
+    queue: asyncio.Queue = asyncio.Queue()
+    # A reconnect replaces the previous stream for this session
+    _sse_channels[session_id] = (channel, queue)
+
+    async def events():
+        try:
+            msg = await _admitted("stream_events", channel.start)
+            if msg is None:
+                # End the stream; EventSource reconnects after the retry delay
+                yield f"retry: {admission.retry_after * 1000}\n\n"
+                return
+            yield _sse_event(msg)
+            while msg["t"] != "done":
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(msg)
+        finally:
+            entry = _sse_channels.get(session_id)
+            if entry is not None and entry[0] is channel:
+                del _sse_channels[session_id]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/stream/{session_id}/answer", status_code=202)
+async def session_stream_answer(
+    session_id: int,
+    payload: Dict[str, Any] = Body(...),
+    user: TokenUser = Depends(get_current_user),
+):
+    """
+    Accept an answer for an open SSE stream; the result and next question
+    are pushed on the stream.
+    """
+    entry = _sse_channels.get(session_id)
+    if entry is None or entry[0].user.id != user.id:
+        raise HTTPException(status_code=404, detail="No open stream for this session")
+    channel, queue = entry
+    async with channel.lock:
+        reply = await run_in_threadpool(channel.answer, payload)
+    queue.put_nowait(reply)
+    return Response(status_code=202)
@@ -2,19 +2,24 @@
 Attempt service: record and fetch attempts.
 
 - Stores correctness and time taken.
-- Provides retrieval by user id.
+- Provides retrieval by user id as lightweight AttemptRecord read models.
+- Reads and writes go to the user's shard (ShardSessionLocal).
 """
 
-from typing import List
+from collections import defaultdict
+from typing import Dict, List
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
-from ..db import SessionLocal, Attempt
+from ..db import ShardSessionLocal, Attempt, shard_index
+from ..read_models import AttemptRecord, load_attempt_records
+from .skill_service import SkillService
 
 
 class AttemptService:
     @staticmethod
     def record_attempt(user_id: int, question_id: int, correct: bool, time_taken: float):
-        db: Session = SessionLocal()
+        db: Session = ShardSessionLocal(user_id)
         try:
             att = Attempt(
                 user_id=user_id,
@@ -25,15 +30,40 @@ class AttemptService:
             db.add(att)
             db.commit()
             db.refresh(att)
+            SkillService.invalidate_user_stats(user_id)
             return att
         finally:
             db.close()
 
     @staticmethod
-    def get_attempts_by_user(user_id: int) -> List[Attempt]:
-        db: Session = SessionLocal()
+    def record_attempts(rows: List[Dict]) -> int:
+        """
+        Bulk insert of attempt rows (user_id, question_id, correct,
+        time_taken, optional timestamp): one executemany INSERT and one
+        transaction per shard touched. Returns the number of rows stored.
+        """
+        by_shard: Dict[int, List[Dict]] = defaultdict(list)
+        for row in rows:
+            by_shard[shard_index(row["user_id"])].append(row)
+        for shard_rows in by_shard.values():
+            db: Session = ShardSessionLocal(shard_rows[0]["user_id"])
+            try:
+                db.execute(insert(Attempt), shard_rows)
+                db.commit()
+            finally:
+                db.close()
+        for user_id in {row["user_id"] for row in rows}:
+            SkillService.invalidate_user_stats(user_id)
+        return len(rows)
+
+    @staticmethod
+    def get_attempts_by_user(user_id: int) -> List[AttemptRecord]:
+        """
+        Raw attempts still in the open partition. Compacted months live in
+        attempt_rollups / archive files (see PartitionService).
+        """
+        db: Session = ShardSessionLocal(user_id)
         try:
-            attempts = db.query(Attempt).filter(Attempt.user_id == user_id).all()
-            return attempts
+            return load_attempt_records(db, user_id)
         finally:
-            db.close()
\ No newline at end of file
+            db.close()
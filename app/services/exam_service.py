@@ -0,0 +1,207 @@
+"""
+Exam service: scheduled cohort exams with pre-warmed sessions.
+
+- An admin registers a cohort (usernames) and a start time.
+- EXAM_PREWARM_LEAD_SECONDS before the start a background timer loads the
+  ML model and question catalog, computes each member's skill stats (into
+  SkillService's cache), picks their first diagnostic question and
+  pre-allocates their test session.
+- /test/start hands a member their pre-allocated session with a dict lookup;
+  anyone else (or a late warm-up) gets a fresh session as before.
+- Sessions not claimed within EXAM_CLAIM_WINDOW_SECONDS of the start are
+  released. Like sessions, exams are kept in memory.
+- A warm-up that raises marks the exam "failed" with the error; sessions
+  allocated before the failure stay claimable until the close timer runs.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..config import EXAM_CLAIM_WINDOW_SECONDS, EXAM_PREWARM_LEAD_SECONDS
+from ..db import SessionLocal, User
+from ..read_models import QuestionCatalog
+from ..test_engine.baseline_generator import BaselineGenerator
+from ..test_engine.model_loader import ModelLoader
+from .session_service import SessionService
+from .skill_service import SkillService
+
+# exam_id -> exam data
+_exams: Dict[int, Dict[str, Any]] = {}
+_next_exam_id = 1
+# user_id -> (exam_id, pre-allocated session id) waiting to be claimed
+_member_sessions: Dict[int, tuple] = {}
+_lock = threading.Lock()
+
+
+def _to_utc_naive(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _start_timer(delay: float, fn, *args) -> threading.Timer:
+    timer = threading.Timer(max(delay, 0.0), fn, args)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class ExamService:
+    @staticmethod
+    def schedule_exam(
+        name: str,
+        start_at: datetime,
+        usernames: List[str],
+        prewarm_lead_seconds: int = EXAM_PREWARM_LEAD_SECONDS,
+    ) -> Dict[str, Any]:
+        """
+        Register a cohort exam and arm its warm-up timer.
+        `start_at` is UTC (naive values are taken as UTC).
+        """
+        global _next_exam_id
+        start_at = _to_utc_naive(start_at)
+        db = SessionLocal()
+        try:
+            rows = db.query(User.id, User.username).filter(User.username.in_(set(usernames))).all()
+        finally:
+            db.close()
+        members = {uid: uname for uid, uname in rows}
+        known = set(members.values())
+
+        with _lock:
+            exam_id = _next_exam_id
+            _next_exam_id += 1
+            exam = {
+                "id": exam_id,
+                "name": name,
+                "start_at": start_at,
+                "members": members,
+                "unknown_usernames": sorted(set(usernames) - known),
+                "status": "scheduled",
+                "sessions": {},
+                "claimed": set(),
+                "warmup_seconds": None,
+                "error": None,
+                "timers": [],
+            }
+            _exams[exam_id] = exam
+            delay = (start_at - datetime.utcnow()).total_seconds() - prewarm_lead_seconds
+            exam["timers"].append(_start_timer(delay, ExamService.prewarm, exam_id))
+        return ExamService.describe(exam)
+
+    @staticmethod
+    def prewarm(exam_id: int):
+        """
+        Warm caches and pre-allocate a session per member. Runs on the timer
+        thread; safe to call directly (e.g. to warm immediately).
+        """
+        with _lock:
+            exam = _exams.get(exam_id)
+            if exam is None or exam["status"] != "scheduled":
+                return
+            exam["status"] = "warming"
+        started = time.perf_counter()
+        error = None
+        try:
+            ExamService._warm_members(exam_id, exam)
+        except Exception as exc:  # runs on the timer thread: keep it on the exam
+            error = f"{type(exc).__name__}: {exc}"
+
+        with _lock:
+            exam["warmup_seconds"] = time.perf_counter() - started
+            if exam["status"] != "warming":
+                return
+            # Members warmed before a failure keep their sessions; everyone
+            # else gets a fresh one at /test/start
+            exam["status"] = "failed" if error else "ready"
+            exam["error"] = error
+            # Always armed, so unclaimed sessions are released either way
+            delay = (exam["start_at"] - datetime.utcnow()).total_seconds() + EXAM_CLAIM_WINDOW_SECONDS
+            exam["timers"].append(_start_timer(delay, ExamService.close_exam, exam_id))
+
+    @staticmethod
+    def _warm_members(exam_id: int, exam: Dict[str, Any]):
+        ModelLoader.load_model()
+        db = SessionLocal()
+        try:
+            QuestionCatalog.get(db)
+            for user_id, username in exam["members"].items():
+                SkillService.get_user_stats(user_id)
+                session_id = SessionService.create_session(user_id, username)
+                session = SessionService.get_session(session_id)
+                first = BaselineGenerator.next_question(db, session)
+                if first is not None:
+                    session["prepared_question_id"] = first.id
+                with _lock:
+                    if exam["status"] != "warming":
+                        # Cancelled mid warm-up
+                        SessionService.end_session(session_id)
+                        continue
+                    previous = _member_sessions.get(user_id)
+                    if previous is not None:
+                        # Member of two overlapping exams: keep the newest session only
+                        SessionService.end_session(previous[1])
+                    _member_sessions[user_id] = (exam_id, session_id)
+                    exam["sessions"][user_id] = session_id
+        finally:
+            db.close()
+
+    @staticmethod
+    def claim_session(user_id: int) -> Optional[int]:
+        """
+        Pop the user's pre-allocated session id, if any.
+        """
+        with _lock:
+            entry = _member_sessions.pop(user_id, None)
+            if entry is None:
+                return None
+            exam_id, session_id = entry
+            exam = _exams.get(exam_id)
+            if exam is not None:
+                exam["claimed"].add(user_id)
+        return session_id if SessionService.get_session(session_id) is not None else None
+
+    @staticmethod
+    def close_exam(exam_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Cancel pending timers and release unclaimed sessions.
+        """
+        with _lock:
+            exam = _exams.get(exam_id)
+            if exam is None:
+                return None
+            for timer in exam["timers"]:
+                timer.cancel()
+            exam["status"] = "closed"
+            released = []
+            for user_id, session_id in exam["sessions"].items():
+                entry = _member_sessions.get(user_id)
+                if entry is not None and entry[0] == exam_id:
+                    del _member_sessions[user_id]
+                    released.append(session_id)
+        for session_id in released:
+            SessionService.end_session(session_id)
+        return ExamService.describe(exam)
+
+    @staticmethod
+    def list_exams() -> List[Dict[str, Any]]:
+        with _lock:
+            exams = list(_exams.values())
+        return [ExamService.describe(e) for e in exams]
+
+    @staticmethod
+    def describe(exam: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": exam["id"],
+            "name": exam["name"],
+            "start_at": exam["start_at"].isoformat() + "Z",
+            "status": exam["status"],
+            "members": len(exam["members"]),
+            "unknown_usernames": exam["unknown_usernames"],
+            "preallocated": len(exam["sessions"]),
+            "claimed": len(exam["claimed"]),
+            "warmup_seconds": exam["warmup_seconds"],
+            "error": exam["error"],
+        }
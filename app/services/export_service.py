@@ -0,0 +1,513 @@
+"""
+Export service: constant-memory streaming dumps of attempts and stats.
+
+- Attempts are paged with keyset pagination on attempts.id (joined with
+  questions), so each page is one short query and memory stays flat.
+  Compacted months are read from their archive files (ATTACHed to the main
+  database) first, then the open partition.
+- Stats are per-user/domain/difficulty aggregates computed in SQL over the
+  open partition plus attempt_rollups (UNION ALL), streamed with
+  yield_per, so they match SkillService.get_user_stats before and after
+  compaction. Rollups are monthly, so a stats date range may not split a
+  compacted month (check_range). Kind "rollups" exports the rollups as-is.
+- Filters (user, date range, domain) are pushed down into the WHERE clause;
+  timezone-aware start/end are converted to naive UTC like the stored
+  timestamps.
+- With user sharding each shard is streamed in turn (only the user's shard
+  when filtering by user), so ordering holds within a shard.
+- Output formats: CSV, JSONL, or Parquet when pyarrow is installed;
+  optional gzip.
+
+CLI usage:
+    python -m app.services.export_service --kind attempts --format jsonl --gzip -o attempts.jsonl.gz
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from sqlalchemy import Integer, Table, and_, cast, func, select, union_all
+from sqlalchemy.orm import Session
+
+from .. import db as database
+from ..config import ARCHIVE_DIR
+from ..db import ShardSessionLocal, Attempt, AttemptRollup, Question, shard_sessions
+from .partition_service import ARCHIVE_SCHEMA, archive_path, archive_table, archived_periods
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+    pq = None
+
+EXPORT_KINDS = ("attempts", "stats", "rollups")
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+DEFAULT_BATCH_SIZE = 5000
+
+ATTEMPT_COLUMNS = [
+    "attempt_id",
+    "user_id",
+    "question_id",
+    "domain",
+    "difficulty",
+    "correct",
+    "time_taken",
+    "timestamp",
+]
+STATS_COLUMNS = [
+    "user_id",
+    "domain",
+    "difficulty",
+    "attempts",
+    "correct",
+    "accuracy",
+    "avg_time",
+]
+ROLLUP_COLUMNS = [
+    "period",
+    "user_id",
+    "domain",
+    "difficulty",
+    "attempts",
+    "correct",
+    "total_time",
+]
+# Arrow type aliases for each kind's columns (in column order). Parquet
+# exports use one fixed schema, so a batch whose nullable column happens to
+# be all NULL cannot change the inferred type mid-file.
+PARQUET_TYPES = {
+    "attempts": ["int64", "int64", "int64", "string", "string", "bool", "double", "timestamp[us]"],
+    "stats": ["int64", "string", "string", "int64", "int64", "double", "double"],
+    "rollups": ["string", "int64", "string", "string", "int64", "int64", "double"],
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _utc_naive(dt: Optional[datetime]) -> Optional[datetime]:
+    """Attempt timestamps are stored as naive UTC; aware filters are converted."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _period(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+
+def _overlapping_periods(periods: List[str], start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+    """Months from `periods` that overlap [start, end)."""
+    return [
+        p
+        for p in periods
+        if (start is None or p >= _period(start))
+        and (end is None or p <= _period(end - timedelta(microseconds=1)))
+    ]
+
+
+def _filters(
+    attempts: Table,
+    user_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    domain: Optional[str],
+) -> list:
+    """WHERE conditions on an attempts table (hot or archived) joined with questions."""
+    conditions = []
+    if user_id is not None:
+        conditions.append(attempts.c.user_id == user_id)
+    if start is not None:
+        conditions.append(attempts.c.timestamp >= start)
+    if end is not None:
+        conditions.append(attempts.c.timestamp < end)
+    if domain is not None:
+        conditions.append(Question.domain == domain)
+    return conditions
+
+
+def _rollup_filters(
+    user_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    domain: Optional[str],
+) -> list:
+    conditions = []
+    if user_id is not None:
+        conditions.append(AttemptRollup.user_id == user_id)
+    # Rollups are monthly: keep every month overlapping [start, end)
+    if start is not None:
+        conditions.append(AttemptRollup.period >= _period(start))
+    if end is not None:
+        conditions.append(AttemptRollup.period <= _period(end - timedelta(microseconds=1)))
+    if domain is not None:
+        conditions.append(AttemptRollup.domain == domain)
+    return conditions
+
+
+def _iter_attempt_batches(db, attempts: Table, conditions: list, batch_size: int) -> Iterator[List[tuple]]:
+    """Keyset-paged rows of `attempts`; `db` is a Session or Connection."""
+    base = (
+        select(
+            attempts.c.id,
+            attempts.c.user_id,
+            attempts.c.question_id,
+            Question.domain,
+            Question.difficulty,
+            attempts.c.correct,
+            attempts.c.time_taken,
+            attempts.c.timestamp,
+        )
+        .join(Question, Question.id == attempts.c.question_id)
+        .order_by(attempts.c.id)
+        .limit(batch_size)
+    )
+    last_id = 0
+    while True:
+        stmt = base.where(and_(attempts.c.id > last_id, *conditions))
+        rows = db.execute(stmt).all()
+        if not rows:
+            db.rollback()
+            return
+        yield [tuple(r) for r in rows]
+        last_id = rows[-1][0]
+        # End the read transaction between pages so writers are not held up
+        db.rollback()
+
+
+def _iter_archived_attempt_batches(
+    periods: List[str],
+    archive_dir: Path,
+    user_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    domain: Optional[str],
+    batch_size: int,
+) -> Iterator[List[tuple]]:
+    """Attempts moved out by compaction, one archive file per month."""
+    archived = archive_table(ARCHIVE_SCHEMA)
+    conditions = _filters(archived, user_id, start, end, domain)
+    for period in periods:
+        # The main database holds the questions to join with
+        with database.engine.connect() as conn:
+            # ATTACH must run outside a transaction
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (str(archive_path(period, archive_dir)),))
+            conn.commit()
+            try:
+                yield from _iter_attempt_batches(conn, archived, conditions, batch_size)
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+                conn.commit()
+
+
+def _iter_stats_batches(
+    db: Session,
+    user_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    domain: Optional[str],
+    batch_size: int,
+) -> Iterator[List[tuple]]:
+    groups = union_all(
+        select(
+            Attempt.user_id,
+            Question.domain,
+            Question.difficulty,
+            func.count(Attempt.id).label("attempts"),
+            func.sum(cast(Attempt.correct, Integer)).label("correct"),
+            func.sum(Attempt.time_taken).label("total_time"),
+        )
+        .join(Question, Question.id == Attempt.question_id)
+        .where(and_(True, *_filters(Attempt.__table__, user_id, start, end, domain)))
+        .group_by(Attempt.user_id, Question.domain, Question.difficulty),
+        select(
+            AttemptRollup.user_id,
+            AttemptRollup.domain,
+            AttemptRollup.difficulty,
+            func.sum(AttemptRollup.attempts),
+            func.sum(AttemptRollup.correct),
+            func.sum(AttemptRollup.total_time),
+        )
+        .where(and_(True, *_rollup_filters(user_id, start, end, domain)))
+        .group_by(AttemptRollup.user_id, AttemptRollup.domain, AttemptRollup.difficulty),
+    ).subquery()
+    attempts = func.sum(groups.c.attempts)
+    correct = func.sum(groups.c.correct)
+    stmt = (
+        select(
+            groups.c.user_id,
+            groups.c.domain,
+            groups.c.difficulty,
+            attempts,
+            correct,
+            correct * 1.0 / attempts,
+            func.sum(groups.c.total_time) / attempts,
+        )
+        .group_by(groups.c.user_id, groups.c.domain, groups.c.difficulty)
+        .order_by(groups.c.user_id, groups.c.domain, groups.c.difficulty)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.execute(stmt).partitions():
+        yield [tuple(r) for r in partition]
+
+
+def _iter_rollup_batches(
+    db: Session,
+    user_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    domain: Optional[str],
+    batch_size: int,
+) -> Iterator[List[tuple]]:
+    stmt = (
+        select(*[AttemptRollup.__table__.c[name] for name in ROLLUP_COLUMNS])
+        .where(and_(True, *_rollup_filters(user_id, start, end, domain)))
+        .order_by(AttemptRollup.period, AttemptRollup.user_id, AttemptRollup.domain, AttemptRollup.difficulty)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.execute(stmt).partitions():
+        yield [tuple(r) for r in partition]
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_chunks(columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_json_value(v) for v in row] for row in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _jsonl_chunks(columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        lines = [
+            json.dumps({c: _json_value(v) for c, v in zip(columns, row)}, separators=(",", ":"))
+            for row in batch
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers bytes until drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(columns: List[str], types: List[str]) -> "pa.Schema":
+    return pa.schema([(name, pa.type_for_alias(alias)) for name, alias in zip(columns, types)])
+
+
+def _parquet_chunks(schema: "pa.Schema", batches: Iterator[List[tuple]], compression: str) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    # Written up front so an export with no rows is still a valid file
+    writer = pq.ParquetWriter(sink, schema, compression=compression)
+    for batch in batches:
+        table = pa.Table.from_arrays(
+            [pa.array(list(col), type=field.type) for col, field in zip(zip(*batch), schema)], schema=schema
+        )
+        # One row group per batch keeps memory bounded by batch_size
+        writer.write_table(table)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # wbits=31 produces a gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ExportService:
+    @staticmethod
+    def check_format(fmt: str) -> Optional[str]:
+        """
+        Returns an error message if the format cannot be produced, else None.
+        """
+        if fmt not in EXPORT_FORMATS:
+            return f"Unknown format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}"
+        if fmt == "parquet" and pa is None:
+            return "Parquet export requires pyarrow to be installed"
+        return None
+
+    @staticmethod
+    def check_range(
+        kind: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        archive_dir: Path = ARCHIVE_DIR,
+    ) -> Optional[str]:
+        """
+        Returns an error message if a stats export would split a compacted
+        month (only monthly rollups are left for it), else None.
+        """
+        if kind != "stats":
+            return None
+        start, end = _utc_naive(start), _utc_naive(end)
+        compacted = set(archived_periods(archive_dir))
+        for bound in (start, end):
+            if bound is not None and bound != datetime(bound.year, bound.month, 1) and _period(bound) in compacted:
+                return (
+                    f"Month {_period(bound)} is compacted; stats ranges must start and end on "
+                    "month boundaries there (or export kind 'attempts')"
+                )
+        return None
+
+    @staticmethod
+    def filename(kind: str, fmt: str, gzip: bool) -> str:
+        name = f"{kind}.{fmt}"
+        # Parquet compresses internally instead of being wrapped in gzip
+        return name + ".gz" if gzip and fmt != "parquet" else name
+
+    @staticmethod
+    def media_type(fmt: str, gzip: bool) -> str:
+        if gzip and fmt != "parquet":
+            return "application/gzip"
+        return MEDIA_TYPES[fmt]
+
+    @staticmethod
+    def stream(
+        kind: str = "attempts",
+        fmt: str = "csv",
+        gzip: bool = False,
+        user_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        domain: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        archive_dir: Path = ARCHIVE_DIR,
+    ) -> Iterator[bytes]:
+        """
+        Yield the encoded export as byte chunks. The DB sessions (one per
+        shard) live as long as the generator and are closed when it finishes
+        or is closed early.
+        """
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"Unknown export kind '{kind}'")
+        start, end = _utc_naive(start), _utc_naive(end)
+        error = ExportService.check_format(fmt) or ExportService.check_range(kind, start, end, archive_dir)
+        if error:
+            raise ValueError(error)
+
+        sessions: List[Session] = [ShardSessionLocal(user_id)] if user_id is not None else shard_sessions()
+        try:
+            if kind == "attempts":
+                columns = ATTEMPT_COLUMNS
+                conditions = _filters(Attempt.__table__, user_id, start, end, domain)
+                periods = _overlapping_periods(archived_periods(archive_dir), start, end)
+                batches = itertools.chain(
+                    _iter_archived_attempt_batches(periods, archive_dir, user_id, start, end, domain, batch_size),
+                    (b for db in sessions for b in _iter_attempt_batches(db, Attempt.__table__, conditions, batch_size)),
+                )
+            elif kind == "stats":
+                columns = STATS_COLUMNS
+                batches = (
+                    b
+                    for db in sessions
+                    for b in _iter_stats_batches(db, user_id, start, end, domain, batch_size)
+                )
+            else:
+                columns = ROLLUP_COLUMNS
+                batches = (
+                    b
+                    for db in sessions
+                    for b in _iter_rollup_batches(db, user_id, start, end, domain, batch_size)
+                )
+
+            if fmt == "csv":
+                chunks = _csv_chunks(columns, batches)
+            elif fmt == "jsonl":
+                chunks = _jsonl_chunks(columns, batches)
+            else:
+                schema = _parquet_schema(columns, PARQUET_TYPES[kind])
+                chunks = _parquet_chunks(schema, batches, "gzip" if gzip else "snappy")
+
+            if gzip and fmt != "parquet":
+                chunks = _gzip_chunks(chunks)
+            yield from chunks
+        finally:
+            for db in sessions:
+                db.close()
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream attempts or stats out of the database.")
+    parser.add_argument("--kind", choices=EXPORT_KINDS, default="attempts")
+    parser.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--start", type=_parse_datetime, default=None, help="ISO date/time, inclusive")
+    parser.add_argument("--end", type=_parse_datetime, default=None, help="ISO date/time, exclusive")
+    parser.add_argument("--domain", default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    error = ExportService.check_format(args.fmt) or ExportService.check_range(args.kind, args.start, args.end)
+    if error:
+        parser.error(error)
+
+    chunks = ExportService.stream(
+        kind=args.kind,
+        fmt=args.fmt,
+        gzip=args.gzip,
+        user_id=args.user_id,
+        start=args.start,
+        end=args.end,
+        domain=args.domain,
+        batch_size=args.batch_size,
+    )
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
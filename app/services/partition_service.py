@@ -0,0 +1,249 @@
+"""
+Partition service: time-partitioned attempt storage with rollup compaction.
+
+- The attempts table is the hot/open partition (current month plus any
+  months not compacted yet).
+- compact() folds each closed month into attempt_rollups
+  (per user/domain/difficulty counts and time totals), moves the raw rows
+  into a per-month SQLite file under ARCHIVE_DIR, and deletes them from the
+  hot table - all in one transaction per month.
+- SkillService.get_user_stats and the stats export read rollups plus the
+  hot table, and the attempts export also reads the archive files, so their
+  results are unchanged by compaction while the hot table stays small.
+- With user sharding every shard is compacted (one transaction per shard
+  and month) into the same monthly archive file; attempt ids are unique
+  across shards.
+
+CLI usage:
+    python -m app.services.partition_service compact [--keep-months 1] [--vacuum]
+    python -m app.services.partition_service status
+"""
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    cast,
+    create_engine,
+    func,
+    literal,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .. import db as database
+from ..config import ARCHIVE_DIR
+from ..db import Attempt, AttemptRollup, Question
+
+ARCHIVE_SCHEMA = "archive"
+
+
+def archive_table(schema: Optional[str] = None) -> Table:
+    """
+    Raw attempts table as stored in an archive file (no FK to users, which
+    lives in the main database).
+    """
+    return Table(
+        "attempts",
+        MetaData(schema=schema),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False, index=True),
+        Column("question_id", Integer, nullable=False),
+        Column("correct", Boolean, nullable=False),
+        Column("time_taken", Float, nullable=False),
+        Column("timestamp", DateTime),
+    )
+
+
+def _month_start(dt: datetime, months_back: int = 0) -> datetime:
+    index = dt.year * 12 + (dt.month - 1) - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _period_bounds(period: str) -> (datetime, datetime):
+    start = datetime.strptime(period, "%Y-%m")
+    return start, _month_start(start, months_back=-1)
+
+
+def archive_path(period: str, archive_dir: Path = ARCHIVE_DIR) -> Path:
+    return Path(archive_dir) / f"attempts_{period.replace('-', '_')}.db"
+
+
+def archived_periods(archive_dir: Path = ARCHIVE_DIR) -> List[str]:
+    """Months ('YYYY-MM') that have an archive file, oldest first."""
+    periods = []
+    for path in Path(archive_dir).glob("attempts_*_*.db"):
+        year, month = path.stem.split("_")[1:3]
+        periods.append(f"{year}-{month}")
+    return sorted(periods)
+
+
+class PartitionService:
+    @staticmethod
+    def closed_periods(keep_months: int = 1, now: Optional[datetime] = None) -> List[str]:
+        """
+        Months ('YYYY-MM') still in the hot table that are older than the
+        `keep_months` most recent months (the current month counts as one).
+        """
+        cutoff = _month_start(now or datetime.utcnow(), months_back=max(keep_months, 1) - 1)
+        period = func.strftime("%Y-%m", Attempt.timestamp)
+        periods = set()
+        for shard_engine in database.shard_engines():
+            with shard_engine.connect() as conn:
+                rows = conn.execute(select(period).where(Attempt.timestamp < cutoff).distinct()).all()
+            periods.update(r[0] for r in rows if r[0])
+        return sorted(periods)
+
+    @staticmethod
+    def compact_period(period: str, archive_dir: Path = ARCHIVE_DIR) -> int:
+        """
+        Fold one closed month into rollups and move its raw rows to the
+        archive file. Returns the number of attempts moved.
+        """
+        start, end = _period_bounds(period)
+        path = archive_path(period, archive_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Create the archive file/table up front (DDL outside the main transaction)
+        archive_engine = create_engine(f"sqlite:///{path}")
+        try:
+            archive_table().metadata.create_all(archive_engine)
+        finally:
+            archive_engine.dispose()
+
+        in_period = (Attempt.timestamp >= start) & (Attempt.timestamp < end)
+        rollup_select = (
+            select(
+                literal(period),
+                Attempt.user_id,
+                Question.domain,
+                Question.difficulty,
+                func.count(Attempt.id),
+                func.sum(cast(Attempt.correct, Integer)),
+                func.sum(Attempt.time_taken),
+            )
+            .join(Question, Question.id == Attempt.question_id)
+            .where(in_period)
+            .group_by(Attempt.user_id, Question.domain, Question.difficulty)
+        )
+        rollup_insert = sqlite_insert(AttemptRollup).from_select(
+            ["period", "user_id", "domain", "difficulty", "attempts", "correct", "total_time"],
+            rollup_select,
+        )
+        # Late rows for an already-compacted month add onto the existing rollup
+        rollup_upsert = rollup_insert.on_conflict_do_update(
+            index_elements=["period", "user_id", "domain", "difficulty"],
+            set_={
+                "attempts": AttemptRollup.attempts + rollup_insert.excluded.attempts,
+                "correct": AttemptRollup.correct + rollup_insert.excluded.correct,
+                "total_time": AttemptRollup.total_time + rollup_insert.excluded.total_time,
+            },
+        )
+        archived = archive_table(ARCHIVE_SCHEMA)
+        columns = [c.name for c in archived.columns]
+        archive_insert = archived.insert().from_select(
+            columns,
+            select(*[Attempt.__table__.c[name] for name in columns]).where(in_period),
+        )
+
+        moved = 0
+        for shard_engine in database.shard_engines():
+            with shard_engine.connect() as conn:
+                # ATTACH must run outside a transaction
+                conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (str(path),))
+                conn.commit()
+                try:
+                    with conn.begin():
+                        conn.execute(rollup_upsert)
+                        moved += conn.execute(archive_insert).rowcount
+                        conn.execute(Attempt.__table__.delete().where(in_period))
+                finally:
+                    conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+                    conn.commit()
+        return moved
+
+    @staticmethod
+    def compact(
+        keep_months: int = 1,
+        now: Optional[datetime] = None,
+        archive_dir: Path = ARCHIVE_DIR,
+        vacuum: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Compact every closed month. Returns {period: attempts_moved}.
+        """
+        moved = {}
+        for period in PartitionService.closed_periods(keep_months, now):
+            moved[period] = PartitionService.compact_period(period, archive_dir)
+        if vacuum and moved:
+            for shard_engine in database.shard_engines():
+                with shard_engine.connect() as conn:
+                    conn.exec_driver_sql("VACUUM")
+        return moved
+
+    @staticmethod
+    def status() -> Dict[str, object]:
+        hot_rows = 0
+        hot_periods: Dict[str, int] = {}
+        rollup_periods: Dict[str, int] = {}
+        for shard_engine in database.shard_engines():
+            with shard_engine.connect() as conn:
+                hot_rows += conn.execute(select(func.count(Attempt.id))).scalar()
+                for p, n in conn.execute(
+                    select(func.strftime("%Y-%m", Attempt.timestamp), func.count(Attempt.id))
+                    .group_by(func.strftime("%Y-%m", Attempt.timestamp))
+                ):
+                    hot_periods[p] = hot_periods.get(p, 0) + n
+                for p, n in conn.execute(
+                    select(AttemptRollup.period, func.sum(AttemptRollup.attempts)).group_by(AttemptRollup.period)
+                ):
+                    rollup_periods[p] = rollup_periods.get(p, 0) + n
+        return {
+            "hot_rows": hot_rows,
+            "hot_periods": dict(sorted(hot_periods.items(), key=lambda item: str(item[0]))),
+            "rollup_periods": dict(sorted(rollup_periods.items())),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage time-partitioned attempt storage.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="fold closed months into rollups and archive raw rows")
+    compact.add_argument("--keep-months", type=int, default=1, help="recent months kept raw (default: 1)")
+    compact.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    compact.add_argument("--vacuum", action="store_true", help="VACUUM the main database afterwards")
+    sub.add_parser("status", help="show hot partition and rollup sizes")
+    args = parser.parse_args(argv)
+
+    # Make sure the rollup table exists on databases created before it was
+    # added, and that archived ids can never be handed out again
+    database.Base.metadata.create_all(bind=database.engine)
+    if database.upgrade_attempts_table(database.engine, getattr(args, "archive_dir", ARCHIVE_DIR)):
+        print("Rebuilt attempts table with AUTOINCREMENT ids")
+
+    if args.command == "compact":
+        moved = PartitionService.compact(args.keep_months, archive_dir=args.archive_dir, vacuum=args.vacuum)
+        if not moved:
+            print("Nothing to compact")
+        for period, count in moved.items():
+            print(f"{period}: archived {count} attempts -> {archive_path(period, args.archive_dir)}")
+    else:
+        info = PartitionService.status()
+        print(f"Hot attempts: {info['hot_rows']}")
+        for period, count in info["hot_periods"].items():
+            print(f"  open   {period}: {count}")
+        for period, count in info["rollup_periods"].items():
+            print(f"  rolled {period}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Question flow service: the question/answer steps shared by the HTTP API and the
+persistent WebSocket/SSE channel.
+
+- select_next_question: baseline during diagnostic, adaptive afterwards
+  (a first question pre-selected by ExamService is served as-is).
+- record_answer: grade, store the attempt and add it to the session.
+- load_answer_keys / record_answers: the same for an ordered batch, with one
+  IN query for the answer keys and one bulk insert.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..db import Question
+from ..read_models import load_question
+from ..test_engine.adaptive_generator import AdaptiveGenerator
+from ..test_engine.baseline_generator import BaselineGenerator
+from .attempt_service import AttemptService
+from .session_service import SessionService
+
+
+def _utc_naive(dt: Optional[datetime]) -> Optional[datetime]:
+    """Attempt timestamps are stored as naive UTC."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class QuestionFlowService:
+    @staticmethod
+    def select_next_question(db: Session, session_id: int, session: dict, user_id: int) -> Optional[Question]:
+        """
+        Returns the full Question row to serve next, or None when complete.
+        """
+        # Pre-allocated exam sessions come with their first question chosen
+        prepared = session.pop("prepared_question_id", None)
+        if prepared is not None and prepared not in session["attempted"]:
+            q = load_question(db, prepared)
+            if q is not None:
+                return q
+
+        # If session in diagnostic mode, use baseline; after diagnostic use adaptive
+        if not session.get("diagnostic_done"):
+            q = BaselineGenerator.next_question(db, session)
+            if q is None:
+                # mark diagnostic done
+                SessionService.mark_diagnostic_done(session_id)
+                # fallback to adaptive selection
+                q = AdaptiveGenerator.next_question(db, user_id, session)
+        else:
+            q = AdaptiveGenerator.next_question(db, user_id, session)
+
+        if q is None:
+            return None
+        # Only the chosen question's text/options are loaded
+        return load_question(db, q.id)
+
+    @staticmethod
+    def serialize_question(q: Question) -> Dict[str, Any]:
+        return {
+            "id": q.id,
+            "text": q.text,
+            "options": q.get_options(),
+            "difficulty": q.difficulty,
+            "domain": q.domain,
+        }
+
+    @staticmethod
+    def record_answer(
+        db: Session,
+        session_id: int,
+        user_id: int,
+        question_id: int,
+        selected_option: int,
+        time_taken: float,
+        correct_option: Optional[int] = None,
+    ) -> Optional[bool]:
+        """
+        Grade and store an answer. Returns correctness, or None if the
+        question does not exist. Pass `correct_option` when the caller
+        already knows it (e.g. it served the question) to skip the lookup.
+        """
+        if correct_option is None:
+            question = db.get(Question, question_id)
+            if not question:
+                return None
+            correct_option = question.correct_option
+
+        correct = selected_option == correct_option
+        AttemptService.record_attempt(
+            user_id=user_id,
+            question_id=question_id,
+            correct=correct,
+            time_taken=time_taken,
+        )
+        SessionService.add_attempt_to_session(session_id, question_id)
+        return correct
+
+    @staticmethod
+    def load_answer_keys(db: Session, question_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        question_id -> correct_option for the given ids, in one IN query.
+        Ids missing from the result do not exist.
+        """
+        ids = set(question_ids)
+        if not ids:
+            return {}
+        rows = db.execute(select(Question.id, Question.correct_option).where(Question.id.in_(ids)))
+        return {qid: correct_option for qid, correct_option in rows}
+
+    @staticmethod
+    def record_answers(
+        answers: List[Dict[str, Any]],
+        answer_keys: Dict[int, int],
+        live_sessions: Optional[Set[int]] = None,
+    ) -> List[bool]:
+        """
+        Grade and store an ordered batch of answers (dicts with session_id,
+        user_id, question_id, selected_option, time_taken and optional
+        answered_at). Every question id must be in `answer_keys`.
+        Only sessions in `live_sessions` (default: all) get their in-memory
+        state updated. Returns correctness per answer, in order.
+        """
+        now = datetime.utcnow()
+        results = []
+        rows = []
+        by_session: Dict[int, List[int]] = defaultdict(list)
+        for a in answers:
+            correct = a["selected_option"] == answer_keys[a["question_id"]]
+            results.append(correct)
+            rows.append(
+                {
+                    "user_id": a["user_id"],
+                    "question_id": a["question_id"],
+                    "correct": correct,
+                    "time_taken": float(a["time_taken"]),
+                    "timestamp": _utc_naive(a.get("answered_at")) or now,
+                }
+            )
+            by_session[a["session_id"]].append(a["question_id"])
+
+        AttemptService.record_attempts(rows)
+        for session_id, question_ids in by_session.items():
+            if live_sessions is None or session_id in live_sessions:
+                SessionService.add_attempts_to_session(session_id, question_ids)
+        return results
@@ -2,12 +2,12 @@
 Session service to maintain active test sessions.
 
 - For simplicity sessions are kept in-memory as dictionary.
-- Each session tracks username, attempted question ids, diagnostic progress.
+- Each session tracks user id, username, attempted question ids, diagnostic progress.
 - This design keeps separation of concerns (DB stores attempts; sessions store ephemeral state).
 """
 
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 # Simple in-memory store: session_id -> data
 _sessions: Dict[int, Dict[str, Any]] = {}
@@ -16,11 +16,12 @@ _next_session_id = 1
 
 class SessionService:
     @staticmethod
-    def create_session(username: str) -> int:
+    def create_session(user_id: int, username: str) -> int:
         global _next_session_id
         sid = _next_session_id
         _next_session_id += 1
         _sessions[sid] = {
+            "user_id": user_id,
             "username": username,
             "attempted": [],
             "created_at": time.time(),
@@ -40,6 +41,20 @@ class SessionService:
         if question_id not in s["attempted"]:
             s["attempted"].append(question_id)
 
+    @staticmethod
+    def add_attempts_to_session(session_id: int, question_ids: List[int]):
+        """
+        Bulk form of add_attempt_to_session, keeping order and skipping repeats.
+        """
+        s = _sessions.get(session_id)
+        if not s:
+            return
+        seen = set(s["attempted"])
+        for question_id in question_ids:
+            if question_id not in seen:
+                seen.add(question_id)
+                s["attempted"].append(question_id)
+
     @staticmethod
     def mark_diagnostic_done(session_id: int):
         s = _sessions.get(session_id)
@@ -7,19 +7,43 @@ Skill service computes simple aggregated statistics:
 
 These features are intentionally straightforward to allow the ML model
 (input to logistic regression) to be explainable for viva.
+
+get_user_stats reads closed months from attempt_rollups and only the
+open (not yet compacted) rows from attempts, aggregated in SQL on the
+user's shard. Results are kept in a small per-user LRU that AttemptService
+invalidates on every new attempt (compaction does not change the stats).
+Each invalidation is stamped with a tick from a global counter, and a
+computed result is only cached if the user was not invalidated after the
+read started, so a slow reader cannot put back stats that miss a
+just-recorded attempt. Only the newest STATS_CACHE_SIZE users' ticks are
+kept; reads that started before a dropped tick are simply not cached.
 """
 
-from typing import Dict, List
-from collections import defaultdict
+import threading
+from typing import Dict, Iterable, List, Tuple
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import Integer, cast, func, select, union_all
+from sqlalchemy.orm import Session
 
-from ..db import Attempt
+from ..config import STATS_CACHE_SIZE
+from ..db import ShardSessionLocal, Attempt, AttemptRollup, Question
+
+# user_id -> stats dict from get_user_stats
+_stats_cache: "OrderedDict[int, Dict]" = OrderedDict()
+# user_id -> tick of their last invalidation, newest STATS_CACHE_SIZE users
+_stats_invalidated: "OrderedDict[int, int]" = OrderedDict()
+_stats_tick = 0
+# Highest tick dropped from _stats_invalidated
+_stats_dropped_tick = 0
+_stats_cache_lock = threading.Lock()
 
 
 class SkillService:
     @staticmethod
     def compute_overall_stats(attempts: List[Attempt]) -> Dict:
         """
-        From a list of Attempt objects compute:
+        From a list of Attempt objects (or AttemptRecord read models) compute:
         - overall_accuracy
         - accuracy_by_domain: {domain: accuracy}
         - accuracy_by_difficulty: {difficulty: accuracy}
@@ -73,4 +97,106 @@ class SkillService:
             "accuracy_by_domain": accuracy_by_domain,
             "accuracy_by_difficulty": accuracy_by_difficulty,
             "avg_time_by_domain": avg_time_by_domain,
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def compute_stats_from_groups(groups: Iterable[Tuple[str, str, int, int, float]]) -> Dict:
+        """
+        Same output as compute_overall_stats, from pre-aggregated groups of
+        (domain, difficulty, attempts, correct, total_time).
+        """
+        total = 0
+        correct = 0
+        domain_counts = defaultdict(int)
+        domain_correct = defaultdict(int)
+        domain_time = defaultdict(float)
+        difficulty_counts = defaultdict(int)
+        difficulty_correct = defaultdict(int)
+
+        for domain, difficulty, n, n_correct, total_time in groups:
+            total += n
+            correct += n_correct
+            domain_counts[domain] += n
+            domain_correct[domain] += n_correct
+            domain_time[domain] += total_time
+            difficulty_counts[difficulty] += n
+            difficulty_correct[difficulty] += n_correct
+
+        if total == 0:
+            return {
+                "overall_accuracy": 0.0,
+                "accuracy_by_domain": {},
+                "accuracy_by_difficulty": {},
+                "avg_time_by_domain": {},
+            }
+
+        return {
+            "overall_accuracy": correct / total,
+            "accuracy_by_domain": {d: domain_correct[d] / domain_counts[d] for d in domain_counts},
+            "accuracy_by_difficulty": {
+                diff: difficulty_correct[diff] / difficulty_counts[diff] for diff in difficulty_counts
+            },
+            "avg_time_by_domain": {d: domain_time[d] / domain_counts[d] for d in domain_counts},
+        }
+
+    @staticmethod
+    def get_user_stats(user_id: int) -> Dict:
+        """
+        Stats over a user's full history: rollups for compacted months plus
+        the open partition still held in the attempts table.
+        Served from the per-user cache when possible; treat the result as read-only.
+        """
+        with _stats_cache_lock:
+            stats = _stats_cache.get(user_id)
+            if stats is not None:
+                _stats_cache.move_to_end(user_id)
+                return stats
+            read_started = _stats_tick
+        # One statement, so both halves come from the same snapshot: a
+        # compaction committing in between could otherwise count the moved
+        # rows twice (or not at all)
+        stmt = union_all(
+            select(
+                Question.domain,
+                Question.difficulty,
+                func.count(Attempt.id),
+                func.sum(cast(Attempt.correct, Integer)),
+                func.sum(Attempt.time_taken),
+            )
+            .join(Question, Question.id == Attempt.question_id)
+            .where(Attempt.user_id == user_id)
+            .group_by(Question.domain, Question.difficulty),
+            select(
+                AttemptRollup.domain,
+                AttemptRollup.difficulty,
+                func.sum(AttemptRollup.attempts),
+                func.sum(AttemptRollup.correct),
+                func.sum(AttemptRollup.total_time),
+            )
+            .where(AttemptRollup.user_id == user_id)
+            .group_by(AttemptRollup.domain, AttemptRollup.difficulty),
+        )
+        db: Session = ShardSessionLocal(user_id)
+        try:
+            rows = db.execute(stmt).all()
+        finally:
+            db.close()
+        stats = SkillService.compute_stats_from_groups(rows)
+        with _stats_cache_lock:
+            # An attempt was recorded mid-read: return the result, don't cache it
+            if _stats_invalidated.get(user_id, _stats_dropped_tick) <= read_started:
+                _stats_cache[user_id] = stats
+                if len(_stats_cache) > STATS_CACHE_SIZE:
+                    _stats_cache.popitem(last=False)
+        return stats
+
+    @staticmethod
+    def invalidate_user_stats(user_id: int):
+        global _stats_tick, _stats_dropped_tick
+        with _stats_cache_lock:
+            _stats_cache.pop(user_id, None)
+            _stats_tick += 1
+            _stats_invalidated[user_id] = _stats_tick
+            _stats_invalidated.move_to_end(user_id)
+            if len(_stats_invalidated) > STATS_CACHE_SIZE:
+                _stats_dropped_tick = _stats_invalidated.popitem(last=False)[1]
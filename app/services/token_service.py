@@ -0,0 +1,63 @@
+"""
+Token service: stateless signed session tokens.
+
+- Token = base64url(JSON payload) + "." + base64url(HMAC-SHA256 signature).
+- Payload carries user id, username and expiry, so verifying a token
+  needs no database access.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import NamedTuple, Optional
+
+from ..config import SECRET_KEY, TOKEN_TTL_SECONDS
+
+
+class TokenUser(NamedTuple):
+    """Identity resolved from a verified token."""
+
+    id: int
+    username: str
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    padding = "=" * (-len(data) % 4)
+    return base64.urlsafe_b64decode(data + padding)
+
+
+def _sign(body: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), body.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+class TokenService:
+    @staticmethod
+    def issue_token(user_id: int, username: str, ttl: int = TOKEN_TTL_SECONDS) -> str:
+        payload = {"uid": int(user_id), "sub": username, "exp": int(time.time()) + int(ttl)}
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return f"{body}.{_sign(body)}"
+
+    @staticmethod
+    def verify_token(token: Optional[str]) -> Optional[TokenUser]:
+        """
+        Returns the TokenUser for a valid, unexpired token, otherwise None.
+        """
+        if not token or token.count(".") != 1 or not token.isascii():
+            return None
+        body, signature = token.split(".")
+        try:
+            if not hmac.compare_digest(signature, _sign(body)):
+                return None
+            payload = json.loads(_b64decode(body))
+            if int(payload["exp"]) < time.time():
+                return None
+            return TokenUser(id=int(payload["uid"]), username=str(payload["sub"]))
+        except (ValueError, KeyError, TypeError, UnicodeError):
+            return None
@@ -0,0 +1,295 @@
+"""
+Tools for user-sharded attempt storage (see app/db.py).
+
+- status: attempt/rollup rows per shard for the configured shard count.
+- rebalance: move every user's attempts and rollups from one shard layout
+  to another (e.g. 1 -> 4, or 4 -> 8). Each batch of users is copied and
+  deleted in one transaction across both files (target ATTACHed to the
+  source). Moved attempts get new ids in the target shard's id range.
+  Run it with the app stopped, then start the app with
+  INTELLIPREP_SHARDS set to the new count.
+- bench: write throughput of record_attempt with W writer processes against
+  1, 2, 4, ... shards. SQLite allows one writer per file, so throughput
+  should grow with the shard count until the disk or the CPUs saturate.
+  Files go to a temporary directory under --dir (default: the system temp
+  dir, which may be tmpfs); point it at the disk the app runs on.
+
+CLI usage:
+    python -m app.sharding status
+    python -m app.sharding rebalance --from-shards 1 --to-shards 4
+    python -m app.sharding bench --shards 1 2 4 8 --writers 8 --seconds 5 --dir /data/bench
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import MetaData, create_engine, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+
+from . import db as database
+from .config import SHARD_DIR
+from .db import Attempt, AttemptRollup, Base, Question, User
+
+TARGET_SCHEMA = "dst"
+# Users moved per transaction
+REBALANCE_BATCH_USERS = 500
+
+
+def _layout_path(count: int, index: int, shard_dir: Path) -> Path:
+    """File holding shard `index` of a `count`-shard layout."""
+    if count <= 1:
+        return Path(database.engine.url.database).resolve()
+    return database.shard_path(index, shard_dir).resolve()
+
+
+def shard_status() -> List[Dict]:
+    status = []
+    for index, shard_engine in enumerate(database.shard_engines()):
+        with shard_engine.connect() as conn:
+            status.append(
+                {
+                    "shard": index,
+                    "file": shard_engine.url.database,
+                    "attempts": conn.execute(select(func.count(Attempt.id))).scalar(),
+                    "users": conn.execute(select(func.count(func.distinct(Attempt.user_id)))).scalar(),
+                    "rollups": conn.execute(select(func.count()).select_from(AttemptRollup)).scalar(),
+                }
+            )
+    return status
+
+
+def _move_users(conn, user_ids: List[int]) -> int:
+    """Copy and delete one batch of users' rows; runs inside a transaction."""
+    target = MetaData(schema=TARGET_SCHEMA)
+    dst_attempts = Attempt.__table__.to_metadata(target)
+    dst_rollups = AttemptRollup.__table__.to_metadata(target)
+
+    attempt_columns = ["user_id", "question_id", "correct", "time_taken", "timestamp"]
+    moved = conn.execute(
+        insert(dst_attempts).from_select(
+            attempt_columns,
+            select(*[Attempt.__table__.c[name] for name in attempt_columns])
+            .where(Attempt.user_id.in_(user_ids))
+            .order_by(Attempt.id),
+        )
+    ).rowcount
+
+    rollup_columns = ["period", "user_id", "domain", "difficulty", "attempts", "correct", "total_time"]
+    rollup_insert = sqlite_insert(dst_rollups).from_select(
+        rollup_columns,
+        select(*[AttemptRollup.__table__.c[name] for name in rollup_columns]).where(
+            AttemptRollup.user_id.in_(user_ids)
+        ),
+    )
+    conn.execute(
+        rollup_insert.on_conflict_do_update(
+            index_elements=["period", "user_id", "domain", "difficulty"],
+            set_={
+                "attempts": dst_rollups.c.attempts + rollup_insert.excluded.attempts,
+                "correct": dst_rollups.c.correct + rollup_insert.excluded.correct,
+                "total_time": dst_rollups.c.total_time + rollup_insert.excluded.total_time,
+            },
+        )
+    )
+    conn.execute(Attempt.__table__.delete().where(Attempt.user_id.in_(user_ids)))
+    conn.execute(AttemptRollup.__table__.delete().where(AttemptRollup.user_id.in_(user_ids)))
+    return moved
+
+
+def rebalance(from_shards: int, to_shards: int, shard_dir: Path = SHARD_DIR) -> Dict[str, int]:
+    """
+    Move rows whose shard changes between the two layouts.
+    Returns {"users": moved_users, "attempts": moved_attempts}.
+    """
+    # Create the target files (tables + id ranges) up front
+    database.configure_shards(to_shards, shard_dir)
+    database.shard_engines()
+
+    moved_users = 0
+    moved_attempts = 0
+    for source_index in range(max(from_shards, 1)):
+        source_path = _layout_path(from_shards, source_index, shard_dir)
+        if not source_path.exists():
+            continue
+        source_engine = create_engine(f"sqlite:///{source_path}")
+        try:
+            with source_engine.connect() as conn:
+                user_ids = {
+                    uid
+                    for (uid,) in conn.execute(
+                        select(Attempt.user_id).union(select(AttemptRollup.user_id))
+                    )
+                }
+            by_target: Dict[int, List[int]] = defaultdict(list)
+            for uid in sorted(user_ids):
+                target_index = database.shard_index(uid, to_shards)
+                if _layout_path(to_shards, target_index, shard_dir) != source_path:
+                    by_target[target_index].append(uid)
+
+            for target_index, uids in by_target.items():
+                target_path = _layout_path(to_shards, target_index, shard_dir)
+                with source_engine.connect() as conn:
+                    # ATTACH must run outside a transaction
+                    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {TARGET_SCHEMA}", (str(target_path),))
+                    conn.commit()
+                    try:
+                        for i in range(0, len(uids), REBALANCE_BATCH_USERS):
+                            batch = uids[i : i + REBALANCE_BATCH_USERS]
+                            with conn.begin():
+                                moved_attempts += _move_users(conn, batch)
+                            moved_users += len(batch)
+                    finally:
+                        conn.exec_driver_sql(f"DETACH DATABASE {TARGET_SCHEMA}")
+                        conn.commit()
+        finally:
+            source_engine.dispose()
+    return {"users": moved_users, "attempts": moved_attempts}
+
+
+def _bench_writer(main_path: str, shard_dir: str, shards: int, users: int, seconds: float, seed: int, barrier, results):
+    """
+    One writer process: record_attempt for random users for `seconds`,
+    starting together with the other writers. Puts (writes, lock_errors).
+    """
+    from .services.attempt_service import AttemptService
+
+    database.configure_engine(f"sqlite:///{main_path}")
+    database.configure_shards(shards, Path(shard_dir))
+    database.shard_engines()
+    rng = random.Random(seed)
+    writes = 0
+    errors = 0
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            AttemptService.record_attempt(
+                user_id=rng.randint(1, users),
+                question_id=rng.randint(1, 8),
+                correct=rng.random() < 0.6,
+                time_taken=rng.uniform(5, 60),
+            )
+            writes += 1
+        except OperationalError:
+            # "database is locked" after the busy timeout
+            errors += 1
+    results.put((writes, errors))
+
+
+def run_benchmark(
+    shard_counts: List[int],
+    writers: int = 8,
+    seconds: float = 5.0,
+    users: int = 10_000,
+    directory: Optional[Path] = None,
+) -> Dict:
+    ctx = multiprocessing.get_context("spawn")
+    if directory is not None:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    results = []
+    for shards in shard_counts:
+        tmp_dir = tempfile.mkdtemp(prefix="intelliprep-shards-", dir=directory)
+        try:
+            main_path = os.path.join(tmp_dir, "main.db")
+            main_engine = create_engine(f"sqlite:///{main_path}")
+            Base.metadata.create_all(bind=main_engine)
+            with main_engine.begin() as conn:
+                conn.execute(
+                    insert(Question),
+                    [
+                        {"text": f"q{i}", "options": "[]", "correct_option": 0, "difficulty": "easy", "domain": "algebra"}
+                        for i in range(8)
+                    ],
+                )
+                conn.execute(insert(User), [{"username": f"u{i}", "hashed_password": "!"} for i in range(users)])
+            main_engine.dispose()
+
+            # Writers start together once every process has imported and connected
+            barrier = ctx.Barrier(writers)
+            queue = ctx.Queue()
+            procs = [
+                ctx.Process(
+                    target=_bench_writer,
+                    args=(main_path, tmp_dir, shards, users, seconds, w, barrier, queue),
+                )
+                for w in range(writers)
+            ]
+            for proc in procs:
+                proc.start()
+            outcomes = [queue.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+            writes = sum(w for w, _ in outcomes)
+            results.append(
+                {
+                    "shards": shards,
+                    "writes": writes,
+                    "lock_errors": sum(e for _, e in outcomes),
+                    "writes_per_second": writes / seconds,
+                }
+            )
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    base = results[0]["writes_per_second"] or 1.0
+    for r in results:
+        r["speedup"] = r["writes_per_second"] / base
+    return {
+        "writers": writers,
+        "seconds": seconds,
+        "users": users,
+        "directory": str(directory or tempfile.gettempdir()),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage user-sharded attempt storage.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="rows per shard for the configured shard count")
+    reb = sub.add_parser("rebalance", help="move users between shard layouts")
+    reb.add_argument("--from-shards", type=int, required=True)
+    reb.add_argument("--to-shards", type=int, required=True)
+    reb.add_argument("--shard-dir", type=Path, default=SHARD_DIR)
+    bench = sub.add_parser("bench", help="write throughput vs. shard count")
+    bench.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    bench.add_argument("--writers", type=int, default=8, help="writer processes")
+    bench.add_argument("--seconds", type=float, default=5.0)
+    bench.add_argument("--users", type=int, default=10_000)
+    bench.add_argument("--dir", type=Path, default=None, help="where to create the benchmark files")
+    bench.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for s in shard_status():
+            print(f"shard {s['shard']}: {s['attempts']} attempts, {s['users']} users, {s['rollups']} rollups  ({s['file']})")
+    elif args.command == "rebalance":
+        # Make sure the main database has every table before reading from it
+        Base.metadata.create_all(bind=database.engine)
+        moved = rebalance(args.from_shards, args.to_shards, args.shard_dir)
+        print(f"Moved {moved['attempts']} attempts for {moved['users']} users")
+        print(f"Start the app with INTELLIPREP_SHARDS={args.to_shards}")
+    else:
+        report = run_benchmark(args.shards, args.writers, args.seconds, args.users, args.dir)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            return
+        print(f"Writers: {report['writers']}  duration: {report['seconds']}s  users: {report['users']}")
+        print(f"Directory: {report['directory']}  CPUs: {report['cpus']}")
+        print(f"{'shards':>6} {'writes/s':>10} {'speedup':>8} {'lock errors':>12}")
+        for r in report["results"]:
+            print(f"{r['shards']:>6} {r['writes_per_second']:>10.1f} {r['speedup']:>8.2f} {r['lock_errors']:>12}")
+
+
+if __name__ == "__main__":
+    main()
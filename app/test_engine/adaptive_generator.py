@@ -6,22 +6,22 @@ Adaptive generator uses ML predictions to pick the next question.
 - Avoid repeated questions.
 - If none fall in window, select one with probability closest to 0.55.
 - If still none (edge cases), pick a medium question randomly.
+- Works on QuestionMeta read models; the caller loads the full row to serve it.
 """
 
 import random
-from typing import Optional, List
+from typing import Optional
 from sqlalchemy.orm import Session
 
-from .feature_builder import build_features
+from .feature_builder import build_feature_matrix
 from .model_loader import ModelLoader
 from ..services.skill_service import SkillService
-from ..services.attempt_service import AttemptService
-from ..db import Question
+from ..read_models import QuestionMeta, load_question_meta
 
 
 class AdaptiveGenerator:
     @staticmethod
-    def next_question(db: Session, user_id: int, session: dict) -> Optional[Question]:
+    def next_question(db: Session, user_id: int, session: dict) -> Optional[QuestionMeta]:
         """
         Choose next question using ML predictions.
 
@@ -29,32 +29,19 @@ class AdaptiveGenerator:
         - For each candidate question build features and predict probability
         - Choose according to selection policy described above
         """
-        # Fetch user attempts and compute stats
-        attempts = AttemptService.get_attempts_by_user(user_id)
-        stats = SkillService.compute_overall_stats(attempts)
+        # Compute stats from rollups + open attempts
+        stats = SkillService.get_user_stats(user_id)
 
-        attempted = set(session.get("attempted", []))
-        all_qs: List[Question] = db.query(Question).all()
-        candidates = [q for q in all_qs if q.id not in attempted]
+        candidates = load_question_meta(db, exclude=session.get("attempted", []))
         if not candidates:
             return None
 
         # Build feature matrix and predict probabilities
-        features_list = []
-        q_map = []
-        for q in candidates:
-            q_meta = {"difficulty": q.difficulty, "domain": q.domain}
-            feat = build_features(stats, q_meta)
-            features_list.append(feat)
-            q_map.append(q)
-
-        import numpy as np
-
-        X = np.vstack(features_list)
+        X = build_feature_matrix(stats, candidates)
         probs = ModelLoader.predict_probability(X)  # array of probabilities
 
         # Pair candidates with probs
-        paired = list(zip(q_map, probs))
+        paired = list(zip(candidates, probs))
         # Filter for moderate probability window
         moderate = [p for p in paired if 0.4 <= p[1] <= 0.7]
         if moderate:
@@ -4,25 +4,24 @@ Baseline generator returns diagnostic questions without ML.
 - Picks random questions of mixed difficulty.
 - Ensures no repeats within session.
 - Used for initial diagnostic test.
+- Works on QuestionMeta read models; the caller loads the full row to serve it.
 """
 
 import random
 from typing import Optional
 from sqlalchemy.orm import Session
 
-from ..db import Question
+from ..read_models import QuestionMeta, load_question_meta
 
 
 class BaselineGenerator:
     @staticmethod
-    def next_question(db: Session, session: dict) -> Optional[Question]:
+    def next_question(db: Session, session: dict) -> Optional[QuestionMeta]:
         """
         Select next diagnostic question randomly across difficulties.
         """
-        attempted = set(session.get("attempted", []))
-        # Fetch all question ids
-        all_qs = db.query(Question).all()
-        candidates = [q for q in all_qs if q.id not in attempted]
+        # Fetch metadata of unattempted questions only
+        candidates = load_question_meta(db, exclude=session.get("attempted", []))
         if not candidates:
             return None
         # Prefer mixed difficulties by random choice
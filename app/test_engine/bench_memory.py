@@ -0,0 +1,197 @@
+"""
+Memory benchmark for the adaptive next-question hot path.
+
+Compares two ways of serving one /api/next_question request against a
+large synthetic question bank:
+
+- "orm": the previous approach - full Question/Attempt ORM instances
+  (text and options blobs included) for every candidate.
+- "read_models": AdaptiveGenerator on QuestionMeta/AttemptRecord tuples,
+  loading text/options only for the chosen question.
+
+Each variant runs in a fresh process so peak RSS is not shared. Per-request
+allocation is the tracemalloc peak during one request.
+
+Usage:
+    python -m app.test_engine.bench_memory --questions 100000 --requests 5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, undefer_group
+
+from ..db import Attempt, Base, Question, SessionLocal, User, configure_engine
+from ..read_models import load_question
+from ..services.skill_service import SkillService
+from .adaptive_generator import AdaptiveGenerator
+from .feature_builder import build_features
+from .model_loader import ModelLoader
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DOMAINS = ["algebra", "calculus", "linear_algebra", "number_theory", "probability", "geometry"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+VARIANTS = ("orm", "read_models")
+
+
+def _seed(db_path: str, questions: int, attempts: int, seed: int):
+    engine = configure_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    filler = "Consider the following expression and choose the correct result. " * 3
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Question),
+            [
+                {
+                    "text": f"{filler}(#{i})",
+                    "options": json.dumps([f"Option {c} for question {i}" for c in "ABCD"]),
+                    "correct_option": rng.randrange(4),
+                    "difficulty": rng.choice(DIFFICULTIES),
+                    "domain": rng.choice(DOMAINS),
+                }
+                for i in range(questions)
+            ],
+        )
+        conn.execute(insert(User), [{"username": "bench", "hashed_password": "!"}])
+        conn.execute(
+            insert(Attempt),
+            [
+                {
+                    "user_id": 1,
+                    "question_id": i + 1,
+                    "correct": rng.random() < 0.6,
+                    "time_taken": rng.uniform(5, 60),
+                }
+                for i in range(attempts)
+            ],
+        )
+    engine.dispose()
+
+
+def _orm_request(user_id: int, session: dict) -> dict:
+    """Previous hot path: full ORM rows for attempts and every candidate."""
+    db = SessionLocal()
+    try:
+        attempts = (
+            db.query(Attempt)
+            .options(joinedload(Attempt.question).undefer_group("content"))
+            .filter(Attempt.user_id == user_id)
+            .all()
+        )
+        stats = SkillService.compute_overall_stats(attempts)
+        attempted = set(session["attempted"])
+        all_qs = db.query(Question).options(undefer_group("content")).all()
+        candidates = [q for q in all_qs if q.id not in attempted]
+        X = np.vstack(
+            [build_features(stats, {"difficulty": q.difficulty, "domain": q.domain}) for q in candidates]
+        )
+        probs = ModelLoader.predict_probability(X)
+        q = min(zip(candidates, probs), key=lambda x: abs(x[1] - 0.55))[0]
+        return {"id": q.id, "text": q.text, "options": q.get_options()}
+    finally:
+        db.close()
+
+
+def _read_model_request(user_id: int, session: dict) -> dict:
+    db = SessionLocal()
+    try:
+        meta = AdaptiveGenerator.next_question(db, user_id, session)
+        q = load_question(db, meta.id)
+        return {"id": q.id, "text": q.text, "options": q.get_options()}
+    finally:
+        db.close()
+
+
+def _measure(variant: str, db_path: str, requests: int, attempts: int) -> Dict:
+    configure_engine(f"sqlite:///{db_path}")
+    ModelLoader.load_model()
+    # Single-threaded: no concurrent requests to batch with
+    ModelLoader.configure_batching(False)
+    handler = _orm_request if variant == "orm" else _read_model_request
+    session = {"attempted": list(range(1, attempts + 1)), "diagnostic_done": True}
+
+    handler(1, session)  # warm-up (imports, model, SQLite page cache)
+
+    # Pass 1: timing and peak RSS without tracemalloc overhead
+    timings = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        handler(1, session)
+        timings.append(time.perf_counter() - t0)
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+    # Pass 2: Python-level allocation per request
+    peaks = []
+    tracemalloc.start()
+    for _ in range(requests):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        handler(1, session)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+
+    return {
+        "variant": variant,
+        "mean_ms": sum(timings) / len(timings) * 1000.0,
+        "peak_alloc_per_request_mib": max(peaks) / 2**20,
+        "mean_alloc_per_request_mib": sum(peaks) / len(peaks) / 2**20,
+        "peak_rss_mib": peak_rss_kb / 1024.0 if peak_rss_kb is not None else None,
+    }
+
+
+def run_benchmark(questions: int = 100_000, requests: int = 5, attempts: int = 50, seed: int = 42) -> Dict:
+    tmp_dir = tempfile.mkdtemp(prefix="intelliprep-bench-")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    try:
+        _seed(db_path, questions, attempts, seed)
+        # Fresh interpreter per variant so peak RSS is measured independently
+        ctx = multiprocessing.get_context("spawn")
+        results = {}
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            for variant in VARIANTS:
+                results[variant] = pool.apply(_measure, (variant, db_path, requests, attempts))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {"questions": questions, "requests": requests, "attempts": attempts, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-request memory of the next-question hot path.")
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--attempts", type=int, default=50, help="attempts already made by the user")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.questions, args.requests, args.attempts)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Questions: {report['questions']}  requests/variant: {report['requests']}")
+    print(f"{'variant':<12} {'mean ms':>10} {'peak alloc MiB':>15} {'mean alloc MiB':>15} {'peak RSS MiB':>13}")
+    for r in report["results"].values():
+        rss = f"{r['peak_rss_mib']:.1f}" if r["peak_rss_mib"] is not None else "n/a"
+        print(
+            f"{r['variant']:<12} {r['mean_ms']:>10.1f} {r['peak_alloc_per_request_mib']:>15.2f} "
+            f"{r['mean_alloc_per_request_mib']:>15.2f} {rss:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
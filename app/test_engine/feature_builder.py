@@ -13,6 +13,8 @@ Features chosen are simple and explainable:
 - domain_encoded (simple hash to small integer)
 """
 
+from typing import Sequence
+
 import numpy as np
 
 
@@ -56,4 +58,39 @@ def build_features(stats: dict, question_meta: dict) -> np.ndarray:
     dom_enc = encode_domain(domain)
 
     features = np.array([overall, acc_domain, acc_diff, avg_time, diff_enc, dom_enc], dtype=float)
-    return features.reshape(1, -1)
\ No newline at end of file
+    return features.reshape(1, -1)
+
+
+def build_feature_matrix(stats: dict, questions: Sequence) -> np.ndarray:
+    """
+    Vectorised build_features for many candidates at once.
+
+    `questions` are objects with .domain and .difficulty (e.g. QuestionMeta).
+    Returns an (n, 6) array with the same rows build_features would produce,
+    without allocating one small array per candidate.
+    """
+    overall = float(stats.get("overall_accuracy", 0.0))
+    acc_by_domain = stats.get("accuracy_by_domain", {})
+    acc_by_diff = stats.get("accuracy_by_difficulty", {})
+    avg_time_by_domain = stats.get("avg_time_by_domain", {})
+
+    # Per-domain and per-difficulty values are computed once, then looked up
+    domain_rows = {}
+    difficulty_rows = {}
+    X = np.empty((len(questions), 6), dtype=float)
+    for i, q in enumerate(questions):
+        d_row = domain_rows.get(q.domain)
+        if d_row is None:
+            d_row = domain_rows[q.domain] = (
+                float(acc_by_domain.get(q.domain, overall)),
+                float(avg_time_by_domain.get(q.domain, 30.0)),
+                encode_domain(q.domain),
+            )
+        f_row = difficulty_rows.get(q.difficulty)
+        if f_row is None:
+            f_row = difficulty_rows[q.difficulty] = (
+                float(acc_by_diff.get(q.difficulty, overall)),
+                DIFFICULTY_MAP.get(q.difficulty, 1),
+            )
+        X[i] = (overall, d_row[0], f_row[0], d_row[1], f_row[1], d_row[2])
+    return X
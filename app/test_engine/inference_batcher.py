@@ -0,0 +1,203 @@
+"""
+Cross-request micro-batching for model inference.
+
+- Callers (request handlers on threadpool threads) enqueue their feature
+  matrix and block until their slice of the result is ready.
+- A single worker thread takes the first queued request, keeps collecting
+  until max_wait has passed since that request was queued or max_rows rows
+  are gathered, then runs one predict on the stacked matrix and splits the
+  result back to the callers.
+- Requests that queue up while a batch is running are picked up by the
+  next batch, so with max_wait=0 batching still happens under load.
+- Failures never take the worker down: a failing predict (any exception)
+  is handed to that batch's callers and the loop carries on. A caller that
+  waits longer than `timeout` abandons its request and predicts on its own
+  thread instead, so a stuck batch cannot hang request handlers.
+- stats() reports the batch-size distribution, rows per batch, predict
+  time, queueing delay (enqueue -> batch start) percentiles and timeouts.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Recent queueing delays kept for percentiles
+DELAY_WINDOW = 4096
+
+
+class _Request:
+    __slots__ = ("features", "enqueued", "done", "result", "error", "abandoned")
+
+    def __init__(self, features: np.ndarray):
+        self.features = features
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        # Set by a caller that gave up waiting; the worker skips it
+        self.abandoned = False
+
+
+def _bucket(n: int) -> str:
+    """Power-of-two bucket label: 1, 2, 3-4, 5-8, ..."""
+    if n <= 2:
+        return str(n)
+    upper = 1 << (n - 1).bit_length()
+    return f"{upper // 2 + 1}-{upper}"
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class InferenceBatcher:
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_wait: float,
+        max_rows: int,
+        timeout: Optional[float] = None,
+    ):
+        """
+        predict_fn maps a stacked (n, n_features) matrix to n scores.
+        timeout: seconds a caller waits for its batch before calling
+        predict_fn itself (None waits forever).
+        """
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Dict[str, int] = {}
+        self._delays: deque = deque(maxlen=DELAY_WINDOW)
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_rows_seen = 0
+        self._predict_seconds = 0.0
+        self._timeouts = 0
+        self._loop_errors = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """
+        Score `features` (n, n_features) as part of the next batch.
+        Blocks the calling thread until the batch has run.
+        """
+        if len(features) == 0:
+            return self.predict_fn(features)
+        self._ensure_started()
+        request = _Request(features)
+        self._queue.put(request)
+        if not request.done.wait(self.timeout):
+            request.abandoned = True
+            with self._stats_lock:
+                self._timeouts += 1
+            return self.predict_fn(features)
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        while True:
+            batch: List[_Request] = []
+            try:
+                first = self._queue.get()
+                batch.append(first)
+                rows = len(first.features)
+                deadline = first.enqueued + self.max_wait
+                while rows < self.max_rows:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(request)
+                    rows += len(request.features)
+                batch = [r for r in batch if not r.abandoned]
+                if batch:
+                    self._execute(batch, sum(len(r.features) for r in batch))
+            except BaseException as exc:  # keep serving; never strand a caller
+                with self._stats_lock:
+                    self._loop_errors += 1
+                for request in batch:
+                    if not request.done.is_set():
+                        request.error = exc
+                        request.done.set()
+
+    def _execute(self, batch: List[_Request], rows: int):
+        started = time.perf_counter()
+        try:
+            if len(batch) == 1:
+                scores = self.predict_fn(batch[0].features)
+            else:
+                scores = self.predict_fn(np.vstack([r.features for r in batch]))
+            offset = 0
+            for request in batch:
+                n = len(request.features)
+                request.result = scores[offset : offset + n]
+                offset += n
+        except BaseException as exc:  # hand the failure to every caller in the batch
+            for request in batch:
+                request.error = exc
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._rows += rows
+                self._max_rows_seen = max(self._max_rows_seen, rows)
+                self._predict_seconds += elapsed
+                label = _bucket(len(batch))
+                self._batch_sizes[label] = self._batch_sizes.get(label, 0) + 1
+                self._delays.extend(started - r.enqueued for r in batch)
+            for request in batch:
+                request.done.set()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            delays = sorted(self._delays)
+            batches = self._batches
+            return {
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_rows": self.max_rows,
+                "batches": batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                # Requests per batch, bucketed by powers of two
+                "batch_size_histogram": dict(
+                    sorted(self._batch_sizes.items(), key=lambda item: int(item[0].split("-")[0]))
+                ),
+                "mean_requests_per_batch": self._requests / batches if batches else 0.0,
+                "mean_rows_per_batch": self._rows / batches if batches else 0.0,
+                "max_rows_per_batch": self._max_rows_seen,
+                "mean_predict_ms": self._predict_seconds / batches * 1000.0 if batches else 0.0,
+                # Callers that gave up on their batch and predicted directly
+                "timeouts": self._timeouts,
+                "loop_errors": self._loop_errors,
+                "queue_delay_ms": {
+                    "mean": sum(delays) / len(delays) * 1000.0 if delays else 0.0,
+                    "p50": _percentile(delays, 0.50) * 1000.0,
+                    "p95": _percentile(delays, 0.95) * 1000.0,
+                    "p99": _percentile(delays, 0.99) * 1000.0,
+                    "max": (delays[-1] if delays else 0.0) * 1000.0,
+                    "window": len(delays),
+                },
+            }
@@ -7,14 +7,25 @@ Model loader for Logistic Regression inference.
 
 This approach avoids training on startup while keeping inference deterministic
 and explainable for the academic setting.
+
+predict_probability goes through an InferenceBatcher when
+INFERENCE_BATCHING is on, so concurrent requests share one predict_proba
+call on their stacked features.
 """
 
 import joblib
 import numpy as np
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict
 
-from ..config import MODEL_PATH
+from ..config import (
+    INFERENCE_BATCH_MAX_ROWS,
+    INFERENCE_BATCH_MAX_WAIT_MS,
+    INFERENCE_BATCH_TIMEOUT_SECONDS,
+    INFERENCE_BATCHING,
+    MODEL_PATH,
+)
+from .inference_batcher import InferenceBatcher
 
 
 class _SimpleLogistic:
@@ -46,6 +57,9 @@ class _SimpleLogistic:
 class ModelLoader:
     _model: Any = None
     _model_path = Path(MODEL_PATH)
+    _batching = INFERENCE_BATCHING
+    # Created below the class; its worker thread starts on first use
+    _batcher: InferenceBatcher = None
 
     @classmethod
     def load_model(cls):
@@ -69,13 +83,49 @@ class ModelLoader:
         cls._model = model
         return cls._model
 
+    @classmethod
+    def configure_batching(
+        cls,
+        enabled: bool,
+        max_wait_ms: float = INFERENCE_BATCH_MAX_WAIT_MS,
+        max_rows: int = INFERENCE_BATCH_MAX_ROWS,
+    ):
+        """
+        Turn cross-request batching on/off (offline single-threaded tools turn
+        it off: there is nobody to batch with).
+        """
+        cls._batching = enabled
+        cls._batcher.max_wait = max_wait_ms / 1000.0
+        cls._batcher.max_rows = max_rows
+
+    @classmethod
+    def batching_stats(cls) -> Dict:
+        return dict(cls._batcher.stats(), enabled=cls._batching)
+
     @classmethod
     def predict_probability(cls, features):
         """
         Returns probability of correct answer for given features.
         features: numpy array (1, n_features) or (n, n_features)
         """
+        if cls._batching and getattr(features, "ndim", 0) == 2:
+            return cls._batcher.predict(features)
+        return cls.predict_direct(features)
+
+    @classmethod
+    def predict_direct(cls, features):
+        """
+        predict_probability without batching (also what each batch runs).
+        """
         model = cls.load_model()
         probs = model.predict_proba(features)
         # return probability of class '1' (correct)
-        return probs[:, 1] if probs.ndim == 2 else float(probs[1])
\ No newline at end of file
+        return probs[:, 1] if probs.ndim == 2 else float(probs[1])
+
+
+ModelLoader._batcher = InferenceBatcher(
+    ModelLoader.predict_direct,
+    INFERENCE_BATCH_MAX_WAIT_MS / 1000.0,
+    INFERENCE_BATCH_MAX_ROWS,
+    timeout=INFERENCE_BATCH_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,375 @@
+"""
+Offline adaptive-test simulator for engine benchmarking.
+
+- Generates synthetic examinees with a latent ability and replays full
+  diagnostic + adaptive sessions directly against BaselineGenerator and
+  AdaptiveGenerator (no HTTP involved).
+- Responses follow a simple Rasch-style model:
+  P(correct) = sigmoid(ability + domain_skill - difficulty_offset).
+- Examinees are spread across a process pool; every worker runs on its own
+  temporary SQLite file seeded with the same synthetic question bank.
+- Reports questions/sec, per-step selection latency and convergence metrics.
+
+Usage:
+    python -m app.test_engine.simulator --examinees 1000 --workers 4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..db import Base, Question, SessionLocal, User, configure_engine
+from ..read_models import AttemptRecord
+from ..services.attempt_service import AttemptService
+from ..services.session_service import SessionService
+from ..services.skill_service import SkillService
+from .adaptive_generator import AdaptiveGenerator
+from .baseline_generator import BaselineGenerator
+from .feature_builder import build_features
+from .model_loader import ModelLoader
+
+DOMAINS = ["algebra", "calculus", "linear_algebra", "number_theory", "probability", "geometry"]
+DIFFICULTY_OFFSET = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+# Adaptive selection window used by AdaptiveGenerator
+TARGET_LOW, TARGET_HIGH, TARGET_P = 0.4, 0.7, 0.55
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class SyntheticExaminee:
+    """
+    Examinee with a latent ability, per-domain skill offsets and a base
+    answering speed. All randomness comes from a per-examinee RNG so runs
+    are reproducible regardless of how examinees are split across workers.
+    """
+
+    def __init__(self, examinee_id: int, seed: int):
+        self.id = examinee_id
+        self.rng = random.Random(seed * 1_000_003 + examinee_id)
+        self.ability = self.rng.gauss(0.0, 1.0)
+        self.domain_skill = {d: self.rng.gauss(0.0, 0.5) for d in DOMAINS}
+        self.base_time = self.rng.lognormvariate(math.log(30.0), 0.3)
+
+    def p_correct(self, domain: str, difficulty: str) -> float:
+        logit = self.ability + self.domain_skill.get(domain, 0.0) - DIFFICULTY_OFFSET.get(difficulty, 0.0)
+        return _sigmoid(logit)
+
+    def answer(self, domain: str, difficulty: str) -> (bool, float):
+        correct = self.rng.random() < self.p_correct(domain, difficulty)
+        scale = self.base_time * (1.25 ** DIFFICULTY_OFFSET.get(difficulty, 0.0))
+        time_taken = max(1.0, self.rng.lognormvariate(math.log(scale), 0.4))
+        return correct, time_taken
+
+
+def _seed_question_bank(bank_size: int, seed: int):
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        for i in range(bank_size):
+            db.add(
+                Question(
+                    text=f"Synthetic question {i + 1}",
+                    options=json.dumps(["A", "B", "C", "D"]),
+                    correct_option=rng.randrange(4),
+                    difficulty=rng.choice(list(DIFFICULTY_OFFSET)),
+                    domain=rng.choice(DOMAINS),
+                )
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _init_worker(root_dir: str, bank_size: int, seed: int):
+    """
+    Process pool initializer: give this worker its own SQLite file.
+    """
+    worker_dir = tempfile.mkdtemp(prefix="worker-", dir=root_dir)
+    engine = configure_engine(f"sqlite:///{os.path.join(worker_dir, 'sim.db')}")
+    Base.metadata.create_all(bind=engine)
+    _seed_question_bank(bank_size, seed)
+    ModelLoader.load_model()
+    # Single-threaded: no concurrent requests to batch with
+    ModelLoader.configure_batching(False)
+
+
+def _run_examinees(examinee_ids: List[int], diagnostic_steps: int, adaptive_steps: int, seed: int) -> Dict:
+    """
+    Run full sessions for a chunk of examinees inside one worker and return
+    raw measurements for the parent to aggregate.
+    """
+    diagnostic_latency = array("d")
+    adaptive_latency = array("d")
+    abilities = array("d")
+    final_accuracy = array("d")
+    targeting_error = array("d")
+    calibration_error = array("d")
+    in_window = 0
+    adaptive_correct = 0
+    answered = 0
+
+    started = time.perf_counter()
+    for eid in examinee_ids:
+        # Generators draw from the global RNG; seeding per examinee keeps
+        # results independent of chunking and --workers
+        random.seed(seed * 7919 + eid)
+        examinee = SyntheticExaminee(eid, seed)
+        db = SessionLocal()
+        try:
+            user = User(username=f"sim-{eid}", hashed_password="!")
+            db.add(user)
+            db.commit()
+            user_id = user.id
+        finally:
+            db.close()
+
+        sid = SessionService.create_session(user_id, f"sim-{eid}")
+        session = SessionService.get_session(sid)
+        # Lightweight attempt history for stats
+        history = []
+
+        for step in range(diagnostic_steps + adaptive_steps):
+            adaptive = step >= diagnostic_steps
+            if adaptive and not session["diagnostic_done"]:
+                SessionService.mark_diagnostic_done(sid)
+
+            # One DB session per step, as the API opens one per request
+            db = SessionLocal()
+            try:
+                t0 = time.perf_counter()
+                if adaptive:
+                    q = AdaptiveGenerator.next_question(db, user_id, session)
+                else:
+                    q = BaselineGenerator.next_question(db, session)
+                elapsed = time.perf_counter() - t0
+                if q is None:
+                    break
+                q_id, domain, difficulty = q.id, q.domain, q.difficulty
+            finally:
+                db.close()
+
+            if adaptive:
+                adaptive_latency.append(elapsed)
+                # Model's view of the chosen question, measured outside the timed region
+                stats = SkillService.compute_overall_stats(history)
+                features = build_features(stats, {"difficulty": difficulty, "domain": domain})
+                p_pred = float(ModelLoader.predict_probability(features)[0])
+                targeting_error.append(abs(p_pred - TARGET_P))
+                calibration_error.append(abs(p_pred - examinee.p_correct(domain, difficulty)))
+                if TARGET_LOW <= p_pred <= TARGET_HIGH:
+                    in_window += 1
+            else:
+                diagnostic_latency.append(elapsed)
+
+            correct, time_taken = examinee.answer(domain, difficulty)
+            AttemptService.record_attempt(user_id, q_id, correct, time_taken)
+            SessionService.add_attempt_to_session(sid, q_id)
+            history.append(AttemptRecord(correct, time_taken, q))
+            answered += 1
+            if adaptive and correct:
+                adaptive_correct += 1
+
+        SessionService.end_session(sid)
+        abilities.append(examinee.ability)
+        final_accuracy.append(SkillService.compute_overall_stats(history)["overall_accuracy"])
+
+    return {
+        "examinees": len(examinee_ids),
+        "answered": answered,
+        "busy_seconds": time.perf_counter() - started,
+        "diagnostic_latency": diagnostic_latency,
+        "adaptive_latency": adaptive_latency,
+        "abilities": abilities,
+        "final_accuracy": final_accuracy,
+        "targeting_error": targeting_error,
+        "calibration_error": calibration_error,
+        "in_window": in_window,
+        "adaptive_correct": adaptive_correct,
+    }
+
+
+def _latency_summary(samples: array) -> Dict:
+    if not samples:
+        return {"count": 0}
+    ms = np.frombuffer(samples, dtype=np.float64) * 1000.0
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def run_simulation(
+    examinees: int = 1000,
+    workers: Optional[int] = None,
+    bank_size: int = 200,
+    diagnostic_steps: int = 5,
+    adaptive_steps: int = 10,
+    chunk_size: Optional[int] = None,
+    seed: int = 42,
+) -> Dict:
+    """
+    Simulate `examinees` full test sessions and return an aggregated report.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, min(500, math.ceil(examinees / (workers * 4))))
+    chunks = [
+        list(range(start, min(start + chunk_size, examinees)))
+        for start in range(0, examinees, chunk_size)
+    ]
+
+    merged = {
+        "examinees": 0,
+        "answered": 0,
+        "busy_seconds": 0.0,
+        "in_window": 0,
+        "adaptive_correct": 0,
+    }
+    series = {
+        key: array("d")
+        for key in (
+            "diagnostic_latency",
+            "adaptive_latency",
+            "abilities",
+            "final_accuracy",
+            "targeting_error",
+            "calibration_error",
+        )
+    }
+
+    root_dir = tempfile.mkdtemp(prefix="intelliprep-sim-")
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(root_dir, bank_size, seed),
+        ) as pool:
+            futures = [
+                pool.submit(_run_examinees, chunk, diagnostic_steps, adaptive_steps, seed)
+                for chunk in chunks
+            ]
+            for fut in as_completed(futures):
+                result = fut.result()
+                for key in merged:
+                    merged[key] += result[key]
+                for key in series:
+                    series[key].extend(result[key])
+    finally:
+        shutil.rmtree(root_dir, ignore_errors=True)
+    wall_seconds = time.perf_counter() - started
+
+    adaptive_count = len(series["adaptive_latency"])
+    abilities = np.frombuffer(series["abilities"], dtype=np.float64)
+    accuracy = np.frombuffer(series["final_accuracy"], dtype=np.float64)
+    if abilities.size > 1 and abilities.std() > 0 and accuracy.std() > 0:
+        ability_correlation = float(np.corrcoef(abilities, accuracy)[0, 1])
+    else:
+        ability_correlation = None
+
+    def _mean(samples: array) -> Optional[float]:
+        return float(np.frombuffer(samples, dtype=np.float64).mean()) if samples else None
+
+    return {
+        "config": {
+            "examinees": examinees,
+            "workers": workers,
+            "bank_size": bank_size,
+            "diagnostic_steps": diagnostic_steps,
+            "adaptive_steps": adaptive_steps,
+            "chunk_size": chunk_size,
+            "seed": seed,
+        },
+        "throughput": {
+            "wall_seconds": wall_seconds,
+            "questions_answered": merged["answered"],
+            "questions_per_sec": merged["answered"] / wall_seconds if wall_seconds > 0 else 0.0,
+            "questions_per_worker_sec": (
+                merged["answered"] / merged["busy_seconds"] if merged["busy_seconds"] > 0 else 0.0
+            ),
+        },
+        "selection_latency": {
+            "diagnostic": _latency_summary(series["diagnostic_latency"]),
+            "adaptive": _latency_summary(series["adaptive_latency"]),
+        },
+        "convergence": {
+            # How well final accuracy recovers latent ability (Pearson r)
+            "ability_accuracy_correlation": ability_correlation,
+            # Share of adaptive picks the model placed inside the 0.4-0.7 window
+            "in_window_rate": merged["in_window"] / adaptive_count if adaptive_count else None,
+            "mean_targeting_error": _mean(series["targeting_error"]),
+            # |predicted - true| probability for adaptive picks
+            "mean_calibration_error": _mean(series["calibration_error"]),
+            "adaptive_accuracy": merged["adaptive_correct"] / adaptive_count if adaptive_count else None,
+        },
+    }
+
+
+def _format_report(report: Dict) -> str:
+    lines = []
+    cfg = report["config"]
+    tp = report["throughput"]
+    lines.append(
+        f"Examinees: {cfg['examinees']}  workers: {cfg['workers']}  bank: {cfg['bank_size']}  "
+        f"steps: {cfg['diagnostic_steps']}+{cfg['adaptive_steps']}"
+    )
+    lines.append(
+        f"Answered {tp['questions_answered']} questions in {tp['wall_seconds']:.2f}s "
+        f"({tp['questions_per_sec']:.1f} q/s, {tp['questions_per_worker_sec']:.1f} q/s per worker)"
+    )
+    for phase, lat in report["selection_latency"].items():
+        if lat["count"]:
+            lines.append(
+                f"{phase:>10} selection: n={lat['count']} mean={lat['mean_ms']:.2f}ms "
+                f"p50={lat['p50_ms']:.2f}ms p90={lat['p90_ms']:.2f}ms p99={lat['p99_ms']:.2f}ms"
+            )
+    lines.append("Convergence:")
+    for key, value in report["convergence"].items():
+        lines.append(f"  {key}: {'n/a' if value is None else f'{value:.4f}'}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay synthetic examinees against the adaptive engine.")
+    parser.add_argument("--examinees", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    parser.add_argument("--bank-size", type=int, default=200)
+    parser.add_argument("--diagnostic-steps", type=int, default=5)
+    parser.add_argument("--adaptive-steps", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_simulation(
+        examinees=args.examinees,
+        workers=args.workers,
+        bank_size=args.bank_size,
+        diagnostic_steps=args.diagnostic_steps,
+        adaptive_steps=args.adaptive_steps,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+    )
+    print(json.dumps(report, indent=2) if args.json else _format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.services.export_service import (
+    ATTEMPT_COLUMNS,
+    PARQUET_TYPES,
+    ExportService,
+    _parquet_chunks,
+    _parquet_schema,
+    _utc_naive,
+)
+
+
+def _read(batches):
+    schema = _parquet_schema(ATTEMPT_COLUMNS, PARQUET_TYPES["attempts"])
+    return pq.read_table(io.BytesIO(b"".join(_parquet_chunks(schema, iter(batches), "snappy"))))
+
+
+def test_all_null_batch_keeps_the_schema():
+    batches = [
+        [(1, 7, 3, "calculus", "easy", True, 4.5, None)],
+        [(2, 7, 4, "algebra", "hard", False, 2.0, datetime(2026, 10, 1, 12, 0))],
+    ]
+    table = _read(batches)
+    assert table.num_rows == 2
+    assert table.schema.field("timestamp").type == pa.timestamp("us")
+    assert table.column("timestamp").to_pylist() == [None, datetime(2026, 10, 1, 12, 0)]
+
+
+def test_empty_export_is_a_valid_file():
+    table = _read([])
+    assert table.num_rows == 0
+    assert table.column_names == ATTEMPT_COLUMNS
+
+
+def test_aware_bounds_are_converted_to_naive_utc(tmp_path):
+    plus5 = timezone(timedelta(hours=5))
+    assert _utc_naive(datetime(2026, 10, 5, tzinfo=plus5)) == datetime(2026, 10, 4, 19, 0)
+    assert _utc_naive(datetime(2026, 10, 5)) == datetime(2026, 10, 5)
+
+    # 05:00+05:00 is midnight UTC, a month boundary of the compacted month
+    (tmp_path / "attempts_2026_03.db").touch()
+    aware = datetime(2026, 3, 1, 5, 0, tzinfo=plus5)
+    assert ExportService.check_range("stats", aware, None, tmp_path) is None
+    assert ExportService.check_range("stats", aware.replace(tzinfo=None), None, tmp_path) is not None
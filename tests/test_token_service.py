@@ -0,0 +1,24 @@
+from app.services.token_service import TokenService, TokenUser
+
+
+def test_round_trip():
+    token = TokenService.issue_token(7, "alice")
+    assert TokenService.verify_token(token) == TokenUser(id=7, username="alice")
+
+
+def test_tampered_token_is_rejected():
+    body, signature = TokenService.issue_token(7, "alice").split(".")
+    forged_body = TokenService.issue_token(1, "admin").split(".")[0]
+    assert TokenService.verify_token(f"{forged_body}.{signature}") is None
+    assert TokenService.verify_token(f"{body}.{signature[:-2]}AA") is None
+    assert TokenService.verify_token(f"{body}.{signature}.x") is None
+
+
+def test_expired_token_is_rejected():
+    token = TokenService.issue_token(7, "alice", ttl=-1)
+    assert TokenService.verify_token(token) is None
+
+
+def test_non_ascii_and_malformed_tokens_are_rejected():
+    for token in ("é.abc", "abc.é", "\xe9.x", "", None, "no-dot", "!!.??"):
+        assert TokenService.verify_token(token) is None